@@ -1,49 +1,123 @@
+import collections
+
 import numpy as np
 
+from afdata.utils import check_random_state
+
+
+# Sparse (COO) contingency table. rows and columns index the sorted ground
+# truth and clustering labels, and counts holds only the non-zero cells.
+ContingencyTable = collections.namedtuple(
+    'ContingencyTable',
+    ['rows', 'columns', 'counts', 'row_sums', 'column_sums']
+)
+
+# Above this many cells per data object the contingency table is built by
+# sorting the occupied cells rather than counting into every cell
+_DENSE_CELLS_PER_DATA_OBJECT = 4
+
+
+def _labels(clustering):
+    # Clusterings are either label arrays or (n, 2) arrays with the labels in
+    # column 1
+    clustering = np.asarray(clustering)
+    if clustering.ndim == 2 and clustering.shape[1] == 2:
+        return clustering[:, 1]
+    if clustering.ndim != 1:
+        raise ValueError('Clusterings must be labels or (n, 2) arrays with the labels in column 1')
+    return clustering
+
+
+def _label_indices(clustering):
+    labels, indices = np.unique(_labels(clustering), return_inverse=True)
+    return indices.ravel(), labels.size
+
+
+def _contingency(ground_truth_indices, total_ground_truth_labels, indices, total_labels, row_sums=None):
+    if row_sums is None:
+        row_sums = np.bincount(ground_truth_indices, minlength=total_ground_truth_labels)
+    column_sums = np.bincount(indices, minlength=total_labels)
+    cells = ground_truth_indices.astype(np.int64) * total_labels + indices
+    if total_ground_truth_labels * total_labels <= _DENSE_CELLS_PER_DATA_OBJECT * max(cells.size, 1):
+        counts = np.bincount(cells, minlength=total_ground_truth_labels * total_labels)
+        cells = np.flatnonzero(counts)
+        counts = counts[cells]
+    else:
+        cells, counts = np.unique(cells, return_counts=True)
+    rows, columns = np.divmod(cells, total_labels)
+    return ContingencyTable(rows, columns, counts, row_sums, column_sums)
+
+
+def contingency_table(ground_truth_clustering, clustering, sparse=False):
+    """Returns how many data objects each pair of ground truth and clustering
+    labels share.
+
+    Works for any number of labels in either clustering. Building it is
+    O(n + r * c) for few labels and O(n log n) for many, and the sparse form
+    only stores the non-zero cells.
+
+    Parameters
+    ----------
+    ground_truth_clustering : np.ndarray
+        Labels, or (n, 2) array with the labels in column 1
+    clustering : np.ndarray
+        Labels, or (n, 2) array with the labels in column 1
+    sparse : bool, optional
+        Return a ContingencyTable of the non-zero cells instead of a dense
+        array
+
+    Returns
+    -------
+    np.ndarray or ContingencyTable
+        Dense tables are (r, c) arrays. Rows are the sorted ground truth
+        labels and columns the sorted clustering labels.
+    """
+    table = _contingency(*(_label_indices(ground_truth_clustering) + _label_indices(clustering)))
+    if sparse:
+        return table
+    dense_table = np.zeros((table.row_sums.size, table.column_sums.size), dtype=table.counts.dtype)
+    dense_table[table.rows, table.columns] = table.counts
+    return dense_table
+
+
+def _entropy(counts):
+    probabilities = counts[counts > 0] / np.sum(counts)
+    return -1 * np.sum(np.multiply(probabilities, np.log10(probabilities)))
+
+
+def _mutual_info(table):
+    total_data_objects = np.sum(table.counts)
+    probabilities_in_both = table.counts / total_data_objects
+    expected_counts = table.row_sums[table.rows] * (table.column_sums[table.columns] / total_data_objects)
+    return np.sum(np.multiply(probabilities_in_both, np.log10(table.counts / expected_counts)))
+
+
+def _normalised_mutual_info(table):
+    clustering_entropy = _entropy(table.column_sums)
+    ground_truth_entropy = _entropy(table.row_sums)
+    # A single cluster shares no information, unless both have a single one
+    if clustering_entropy == 0 or ground_truth_entropy == 0:
+        return 1.0 if clustering_entropy == ground_truth_entropy else 0.0
+    return np.divide(_mutual_info(table), np.sqrt(np.multiply(clustering_entropy, ground_truth_entropy)))
+
+
 def calculate_cluster_probabilities(clustering):
-    total_data_objects = clustering.shape[0]
-    total_clusters = np.unique(clustering[:, 1]).size
-    cluster_probabilities = np.empty(total_clusters)
-    for i, cluster in enumerate(range(total_clusters)):
-        cluster_mask = clustering[:, 1] == cluster
-        data_objects_in_cluster = clustering[cluster_mask]
-        cluster_probabilities[i] = data_objects_in_cluster.shape[0] / total_data_objects
-    return cluster_probabilities
+    indices, total_clusters = _label_indices(clustering)
+    return np.bincount(indices, minlength=total_clusters) / indices.size
+
 
 def calculate_entropy(clustering):
-    cluster_probabilities = calculate_cluster_probabilities(clustering)
-    return -1 * np.sum(np.multiply(cluster_probabilities, np.log10(cluster_probabilities)))
+    indices, total_clusters = _label_indices(clustering)
+    return _entropy(np.bincount(indices, minlength=total_clusters))
+
 
 def calculate_mutual_info(ground_truth_clustering, clustering):
-    total_data_objects = clustering.shape[0]
-    total_clusters = np.unique(clustering[:, 1]).size
-    ground_truth_total_clusters = np.unique(ground_truth_clustering[:, 1]).size
-    result = 0
-    for i in range(total_clusters):
-        probabilities_in_both = np.empty(total_clusters)
-        for j in range(total_clusters):
-            cluster_mask = np.all([clustering[:, 1] == i, ground_truth_clustering[:, 1] == j], axis=0)
-            data_objects_in_both = clustering[cluster_mask]
-            probabilities_in_both[j] = (data_objects_in_both.shape[0] / total_data_objects)
-        ground_truth_cluster_probabilities = calculate_cluster_probabilities(ground_truth_clustering)
-        cluster_probabilities = calculate_cluster_probabilities(clustering)
-        if cluster_probabilities.shape[0] > ground_truth_cluster_probabilities.shape[0]:
-            cluster_probabilities = cluster_probabilities[:ground_truth_cluster_probabilities.shape[0]]
-        elif ground_truth_cluster_probabilities.shape[0] > cluster_probabilities.shape[0]:
-            ground_truth_cluster_probabilities = ground_truth_cluster_probabilities[:cluster_probabilities.shape[0]]
-        probabilities_in_both = probabilities_in_both[:cluster_probabilities.shape[0]]
-        total = 0
-        for j in range(probabilities_in_both.size):
-            if probabilities_in_both[j] > 0:
-                total = total + (probabilities_in_both[j] * np.log10(probabilities_in_both[j] / (cluster_probabilities[j] * ground_truth_cluster_probabilities[j])))
-        result = result + total
-    return result
+    return _mutual_info(contingency_table(ground_truth_clustering, clustering, sparse=True))
+
 
 def calculate_normalised_mutual_info(ground_truth_clustering, clustering):
-    ground_truth_clustering_entropy = calculate_entropy(ground_truth_clustering)
-    clustering_entropy = calculate_entropy(clustering)
-    mutual_info = calculate_mutual_info(ground_truth_clustering, clustering)
-    return np.divide(mutual_info, np.sqrt(np.multiply(clustering_entropy, ground_truth_clustering_entropy)))
+    return _normalised_mutual_info(contingency_table(ground_truth_clustering, clustering, sparse=True))
+
 
 def get_cluster_labels(clustering, label_column):
     return np.unique(clustering[:, label_column])
@@ -51,44 +125,478 @@ def get_cluster_labels(clustering, label_column):
 def calculate_total_data_objects(clustering):
     return clustering.shape[0]
 
+
+def pair_confusion(ground_truth_clustering, clustering):
+    """Returns the pair counts of the clustering against the ground truth.
+
+    Every ordered pair of distinct data objects is counted, so each unordered
+    pair counts twice. The counts come from the non-zero cells of the
+    contingency table rather than from comparing all n^2 pairs.
+
+    Parameters
+    ----------
+    ground_truth_clustering : np.ndarray
+        Labels, or (n, 2) array with the labels in column 1
+    clustering : np.ndarray
+        Labels, or (n, 2) array with the labels in column 1
+
+    Returns
+    -------
+    int
+        True positives, pairs in the same cluster and the same ground truth
+        cluster
+    int
+        True negatives, pairs in different clusters and different ground
+        truth clusters
+    int
+        False positives, pairs in the same cluster but different ground truth
+        clusters
+    int
+        False negatives, pairs in different clusters but the same ground
+        truth cluster
+    """
+    return _pair_confusion(contingency_table(ground_truth_clustering, clustering, sparse=True))
+
+
+def _pair_confusion(table):
+    counts = table.counts.astype(np.int64)
+    row_sums = table.row_sums.astype(np.int64)
+    column_sums = table.column_sums.astype(np.int64)
+    total_data_objects = int(np.sum(counts))
+    true_positives = int(np.sum(counts * (counts - 1)))
+    same_cluster_pairs = int(np.sum(column_sums * (column_sums - 1)))
+    same_ground_truth_pairs = int(np.sum(row_sums * (row_sums - 1)))
+    false_positives = same_cluster_pairs - true_positives
+    false_negatives = same_ground_truth_pairs - true_positives
+    true_negatives = total_data_objects * (total_data_objects - 1) - true_positives - false_positives \
+        - false_negatives
+    return true_positives, true_negatives, false_positives, false_negatives
+
+
 def calculate_total_true_positives(ground_truth_clustering, clustering):
-    total = 0
-    for i, data_object_1_label in enumerate(clustering):
-        for j, data_object_2_label in enumerate(clustering):
-            if i != j:
-                if data_object_1_label == data_object_2_label and ground_truth_clustering[i] == ground_truth_clustering[j]:
-                    total += 1
-    return total
+    return pair_confusion(ground_truth_clustering, clustering)[0]
+
 
 def calculate_total_true_negatives(ground_truth_clustering, clustering):
-    total = 0
-    for i, data_object_1_label in enumerate(clustering):
-        for j, data_object_2_label in enumerate(clustering):
-            if i != j:
-                if data_object_1_label != data_object_2_label and ground_truth_clustering[i] != ground_truth_clustering[j]:
-                    total += 1
-    return total
+    return pair_confusion(ground_truth_clustering, clustering)[1]
+
 
 def calculate_total_false_positives(ground_truth_clustering, clustering):
-    total = 0
-    for i, data_object_1_label in enumerate(clustering):
-        for j, data_object_2_label in enumerate(clustering):
-            if i != j:
-                if data_object_1_label == data_object_2_label and ground_truth_clustering[i] != ground_truth_clustering[j]:
-                    total += 1
-    return total
+    return pair_confusion(ground_truth_clustering, clustering)[2]
+
 
 def calculate_total_false_negatives(ground_truth_clustering, clustering):
-    total = 0
-    for i, data_object_1_label in enumerate(clustering):
-        for j, data_object_2_label in enumerate(clustering):
-            if i != j:
-                if data_object_1_label != data_object_2_label and ground_truth_clustering[i] == ground_truth_clustering[j]:
-                    total += 1
-    return total
+    return pair_confusion(ground_truth_clustering, clustering)[3]
+
+
+def _jaccard_coefficient(table):
+    total_true_positives, total_true_negatives, total_false_positives, total_false_negatives = \
+        _pair_confusion(table)
+    pairs_together = total_true_positives + total_false_positives + total_false_negatives
+    if pairs_together == 0:
+        # Neither clustering puts any pair together, so they agree
+        return 1.0
+    return total_true_positives / pairs_together
+
 
 def calculate_jaccard_coefficient(ground_truth_clustering, clustering):
-    total_true_positives = calculate_total_true_positives(ground_truth_clustering, clustering)
-    total_false_positives = calculate_total_false_positives(ground_truth_clustering, clustering)
-    total_false_negatives = calculate_total_false_negatives(ground_truth_clustering, clustering)
-    return total_true_positives / (total_true_positives + total_false_positives + total_false_negatives)
+    return _jaccard_coefficient(contingency_table(ground_truth_clustering, clustering, sparse=True))
+
+
+def _rand_index(table):
+    true_positives, true_negatives, false_positives, false_negatives = _pair_confusion(table)
+    total_pairs = true_positives + true_negatives + false_positives + false_negatives
+    if total_pairs == 0:
+        # Fewer than 2 data objects leave no pair to disagree on
+        return 1.0
+    return (true_positives + true_negatives) / total_pairs
+
+
+def _adjusted_rand_index(table):
+    true_positives, true_negatives, false_positives, false_negatives = _pair_confusion(table)
+    # The pair counts are over ordered pairs, which scales every term alike
+    total_pairs = true_positives + true_negatives + false_positives + false_negatives
+    same_cluster_pairs = true_positives + false_positives
+    same_ground_truth_pairs = true_positives + false_negatives
+    if total_pairs == 0:
+        return 1.0
+    expected_index = same_cluster_pairs * same_ground_truth_pairs / total_pairs
+    max_index = (same_cluster_pairs + same_ground_truth_pairs) / 2
+    if max_index == expected_index:
+        # Both clusterings put everything together or everything apart
+        return 1.0
+    return (true_positives - expected_index) / (max_index - expected_index)
+
+
+def _fowlkes_mallows_index(table):
+    true_positives, true_negatives, false_positives, false_negatives = _pair_confusion(table)
+    if true_positives == 0:
+        return 0.0
+    return true_positives / np.sqrt((true_positives + false_positives) * (true_positives + false_negatives))
+
+
+def _conditional_entropy(counts, group_sums, groups):
+    # Entropy of the labels within each group, weighted by group size
+    total_data_objects = np.sum(counts)
+    return -1 * np.sum(np.multiply(counts / total_data_objects, np.log10(counts / group_sums[groups])))
+
+
+def _homogeneity(table):
+    ground_truth_entropy = _entropy(table.row_sums)
+    if ground_truth_entropy == 0:
+        return 1.0
+    return 1 - _conditional_entropy(table.counts, table.column_sums, table.columns) / ground_truth_entropy
+
+
+def _completeness(table):
+    clustering_entropy = _entropy(table.column_sums)
+    if clustering_entropy == 0:
+        return 1.0
+    return 1 - _conditional_entropy(table.counts, table.row_sums, table.rows) / clustering_entropy
+
+
+def _v_measure(table):
+    homogeneity = _homogeneity(table)
+    completeness = _completeness(table)
+    if homogeneity + completeness == 0:
+        return 0.0
+    return 2 * homogeneity * completeness / (homogeneity + completeness)
+
+
+def _purity(table):
+    largest_in_cluster = np.zeros(table.column_sums.size, dtype=table.counts.dtype)
+    np.maximum.at(largest_in_cluster, table.columns, table.counts)
+    return np.sum(largest_in_cluster) / np.sum(table.counts)
+
+
+_METRICS = collections.OrderedDict([
+    ('jaccard', _jaccard_coefficient),
+    ('rand', _rand_index),
+    ('adjusted_rand', _adjusted_rand_index),
+    ('fowlkes_mallows', _fowlkes_mallows_index),
+    ('mutual_info', _mutual_info),
+    ('normalised_mutual_info', _normalised_mutual_info),
+    ('homogeneity', _homogeneity),
+    ('completeness', _completeness),
+    ('v_measure', _v_measure),
+    ('purity', _purity),
+])
+
+
+def _check_metrics(metrics):
+    if metrics is None:
+        return list(_METRICS)
+    for metric in metrics:
+        if metric not in _METRICS:
+            raise ValueError('metrics must be from {0}'.format(', '.join(_METRICS)))
+    return metrics
+
+
+def _report(table, metrics):
+    return dict((metric, float(_METRICS[metric](table))) for metric in metrics)
+
+
+def validate(ground_truth_clustering, clustering, metrics=None):
+    """Returns external validation metrics of a clustering against the ground
+    truth.
+
+    The contingency table and its marginals are built once and every metric
+    is derived from them.
+
+    Parameters
+    ----------
+    ground_truth_clustering : np.ndarray
+        Labels, or (n, 2) array with the labels in column 1
+    clustering : np.ndarray
+        Labels, or (n, 2) array with the labels in column 1
+    metrics : list of str, optional
+        Any of 'jaccard', 'rand', 'adjusted_rand', 'fowlkes_mallows',
+        'mutual_info', 'normalised_mutual_info', 'homogeneity',
+        'completeness', 'v_measure' and 'purity'. Defaults to all of them.
+
+    Returns
+    -------
+    dict
+        Key of each item is the metric and the value is its score
+    """
+    return validate_batch(ground_truth_clustering, [clustering], metrics)[0]
+
+
+def validate_batch(ground_truth_clustering, clusterings, metrics=None):
+    """Returns external validation metrics of each of a batch of clusterings
+    against the ground truth.
+
+    The ground truth labels and marginals are only computed once for the
+    whole batch.
+
+    Parameters
+    ----------
+    ground_truth_clustering : np.ndarray
+        Labels, or (n, 2) array with the labels in column 1
+    clusterings : iterable of np.ndarray
+        Each is labels, or an (n, 2) array with the labels in column 1
+    metrics : list of str, optional
+        As for validate
+
+    Returns
+    -------
+    list of dict
+        Report of each clustering, as validate returns it
+    """
+    metrics = _check_metrics(metrics)
+    ground_truth_indices, total_ground_truth_labels = _label_indices(ground_truth_clustering)
+    row_sums = np.bincount(ground_truth_indices, minlength=total_ground_truth_labels)
+    reports = []
+    for clustering in clusterings:
+        indices, total_labels = _label_indices(clustering)
+        if indices.size != ground_truth_indices.size:
+            raise ValueError('clustering must label as many data objects as ground_truth_clustering')
+        table = _contingency(ground_truth_indices, total_ground_truth_labels, indices, total_labels, row_sums)
+        reports.append(_report(table, metrics))
+    return reports
+
+
+class ContingencyAccumulator(object):
+    """Accumulates the contingency table of labelings that arrive in chunks.
+
+    Only the count of each (ground truth label, clustering label) pair is
+    kept, so memory grows with the number of label pairs and not with the
+    number of data objects. Metrics can be read at any point and cover every
+    chunk seen so far.
+
+    Attributes
+    ----------
+    counts : collections.Counter
+        Key of each item is a (ground truth label, clustering label) pair and
+        the value is the number of data objects that have both
+    total_data_objects : int
+    """
+
+    def __init__(self):
+        self.counts = collections.Counter()
+        self.total_data_objects = 0
+
+    def update(self, ground_truth_chunk, clustering_chunk):
+        """Adds a chunk of labelled data objects.
+
+        Parameters
+        ----------
+        ground_truth_chunk : np.ndarray
+            Labels, or (m, 2) array with the labels in column 1
+        clustering_chunk : np.ndarray
+            Labels, or (m, 2) array with the labels in column 1
+
+        Returns
+        -------
+        ContingencyAccumulator
+        """
+        ground_truth_labels = _labels(ground_truth_chunk)
+        labels = _labels(clustering_chunk)
+        if ground_truth_labels.size != labels.size:
+            raise ValueError('Chunks must label the same number of data objects')
+        if labels.size == 0:
+            return self
+        ground_truth_values, ground_truth_indices = np.unique(ground_truth_labels, return_inverse=True)
+        values, indices = np.unique(labels, return_inverse=True)
+        table = _contingency(ground_truth_indices.ravel(), ground_truth_values.size, indices.ravel(), values.size)
+        for row, column, count in zip(table.rows, table.columns, table.counts):
+            self.counts[(ground_truth_values[row].item(), values[column].item())] += int(count)
+        self.total_data_objects += labels.size
+        return self
+
+    def table(self):
+        """Returns the contingency table of every chunk so far.
+
+        Returns
+        -------
+        ContingencyTable
+        """
+        if not self.counts:
+            raise ValueError('No data objects have been added')
+        pairs = list(self.counts)
+        ground_truth_values, rows = np.unique([pair[0] for pair in pairs], return_inverse=True)
+        values, columns = np.unique([pair[1] for pair in pairs], return_inverse=True)
+        rows, columns = rows.ravel(), columns.ravel()
+        counts = np.array([self.counts[pair] for pair in pairs], dtype=np.int64)
+        row_sums = np.bincount(rows, weights=counts, minlength=ground_truth_values.size).astype(np.int64)
+        column_sums = np.bincount(columns, weights=counts, minlength=values.size).astype(np.int64)
+        return ContingencyTable(rows, columns, counts, row_sums, column_sums)
+
+    def pair_confusion(self):
+        """Returns the pair counts so far, as pair_confusion does."""
+        return _pair_confusion(self.table())
+
+    def jaccard_coefficient(self):
+        """Returns the Jaccard coefficient so far."""
+        return _jaccard_coefficient(self.table())
+
+    def normalised_mutual_info(self):
+        """Returns the normalised mutual information so far."""
+        return _normalised_mutual_info(self.table())
+
+    def validate(self, metrics=None):
+        """Returns the metrics so far, as validate does for one clustering."""
+        return _report(self.table(), _check_metrics(metrics))
+
+
+# Bytes of pairwise distances to hold in memory at a time when computing the
+# silhouette coefficient
+_SILHOUETTE_WORKING_MEMORY = 64 * 2 ** 20
+
+
+def _internal_validation_labels(data_objects, assignments):
+    indices, total_clusters = _label_indices(assignments)
+    if indices.size != data_objects.shape[0]:
+        raise ValueError('assignments must have one label per data object')
+    if total_clusters < 2 or total_clusters >= indices.size:
+        raise ValueError('Number of clusters must be at least 2 and less than the number of data objects')
+    return indices, total_clusters
+
+
+def _cluster_means(data_objects, indices, total_clusters):
+    counts = np.bincount(indices, minlength=total_clusters)
+    means = np.empty((total_clusters, data_objects.shape[1]))
+    for dimension in range(data_objects.shape[1]):
+        means[:, dimension] = np.bincount(indices, weights=data_objects[:, dimension], minlength=total_clusters)
+    return means / counts[:, np.newaxis], counts
+
+
+def _pairwise_distances(data_objects_1, data_objects_2, squared_norms_2):
+    # Works in place, as the result can be most of the working memory
+    distances = np.dot(data_objects_1, data_objects_2.T)
+    distances *= -2
+    distances += np.einsum('ij,ij->i', data_objects_1, data_objects_1)[:, np.newaxis]
+    distances += squared_norms_2[np.newaxis, :]
+    np.maximum(distances, 0, out=distances)
+    return np.sqrt(distances, out=distances)
+
+
+def _stratified_sample(indices, total_clusters, sample_size, random_state):
+    # Every cluster keeps its share of the sample and at least 2 data objects
+    # where it has them, so no cluster's silhouette is left out
+    counts = np.bincount(indices, minlength=total_clusters)
+    sample_counts = np.maximum(np.round(counts * sample_size / indices.size).astype(int), np.minimum(counts, 2))
+    members = np.argsort(indices, kind='stable')
+    starts = np.concatenate([[0], np.cumsum(counts)[:-1]])
+    sample = [random_state.choice(members[start:start + count], sample_count, replace=False)
+              for start, count, sample_count in zip(starts, counts, sample_counts)]
+    return np.sort(np.concatenate(sample))
+
+
+def calculate_silhouette_coefficient(data_objects, assignments, sample_size=None, random_state=None,
+                                     block_size=None):
+    """Returns the mean silhouette coefficient of the data objects.
+
+    Distances are computed one block of rows at a time against all the data
+    objects, so memory stays at block_size * n rather than n^2.
+
+    Parameters
+    ----------
+    data_objects : np.ndarray
+        (n, d) array
+    assignments : np.ndarray
+        Cluster label of each data object, such as the output of kmeans
+    sample_size : int, optional
+        Computes the coefficient over a sample of about this many data
+        objects, stratified by cluster
+    random_state : int or np.random.RandomState, optional
+        Seeds the sample
+    block_size : int, optional
+        Number of rows of distances to hold at a time. Defaults to as many as
+        fit in 64MB.
+
+    Returns
+    -------
+    float
+    """
+    data_objects = np.asarray(data_objects, dtype=float)
+    indices, total_clusters = _internal_validation_labels(data_objects, assignments)
+    if sample_size is not None and sample_size < indices.size:
+        random_state = check_random_state(random_state)
+        sample = _stratified_sample(indices, total_clusters, sample_size, random_state)
+        data_objects = data_objects[sample]
+        indices = indices[sample]
+    # Sorting by cluster lets each cluster's distances be summed with reduceat
+    order = np.argsort(indices, kind='stable')
+    data_objects = data_objects[order]
+    indices = indices[order]
+    counts = np.bincount(indices, minlength=total_clusters)
+    starts = np.concatenate([[0], np.cumsum(counts)[:-1]])
+    total_data_objects = indices.size
+    if block_size is None:
+        block_size = max(1, _SILHOUETTE_WORKING_MEMORY // (8 * total_data_objects))
+    squared_norms = np.einsum('ij,ij->i', data_objects, data_objects)
+    silhouettes = np.empty(total_data_objects)
+    for start in range(0, total_data_objects, block_size):
+        stop = min(start + block_size, total_data_objects)
+        rows = np.arange(stop - start)
+        own_clusters = indices[start:stop]
+        distances = _pairwise_distances(data_objects[start:stop], data_objects, squared_norms)
+        cluster_distances = np.add.reduceat(distances, starts, axis=1)
+        # Mean distance to the rest of the data object's own cluster
+        within = cluster_distances[rows, own_clusters] / np.maximum(counts[own_clusters] - 1, 1)
+        # Mean distance to the nearest other cluster
+        cluster_distances /= counts
+        cluster_distances[rows, own_clusters] = np.inf
+        nearest = np.min(cluster_distances, axis=1)
+        largest = np.maximum(within, nearest)
+        block_silhouettes = np.zeros(stop - start)
+        defined = (counts[own_clusters] > 1) & (largest > 0)
+        block_silhouettes[defined] = (nearest[defined] - within[defined]) / largest[defined]
+        silhouettes[start:stop] = block_silhouettes
+    return float(np.mean(silhouettes))
+
+
+def calculate_davies_bouldin_index(data_objects, assignments):
+    """Returns the Davies-Bouldin index of the clustering. Lower is better.
+
+    Parameters
+    ----------
+    data_objects : np.ndarray
+        (n, d) array
+    assignments : np.ndarray
+        Cluster label of each data object, such as the output of kmeans
+
+    Returns
+    -------
+    float
+    """
+    data_objects = np.asarray(data_objects, dtype=float)
+    indices, total_clusters = _internal_validation_labels(data_objects, assignments)
+    centroids, counts = _cluster_means(data_objects, indices, total_clusters)
+    distances_to_centroids = np.sqrt(np.sum(np.power(data_objects - centroids[indices], 2), axis=1))
+    scatter = np.bincount(indices, weights=distances_to_centroids, minlength=total_clusters) / counts
+    centroid_distances = _pairwise_distances(centroids, centroids, np.einsum('ij,ij->i', centroids, centroids))
+    # Clusters with the same centroid and no scatter are no worse for it
+    centroid_distances[centroid_distances == 0] = np.inf
+    ratios = (scatter[:, np.newaxis] + scatter[np.newaxis, :]) / centroid_distances
+    np.fill_diagonal(ratios, -np.inf)
+    return float(np.mean(np.max(ratios, axis=1)))
+
+
+def calculate_calinski_harabasz_index(data_objects, assignments):
+    """Returns the Calinski-Harabasz index of the clustering, the ratio of
+    between-cluster to within-cluster dispersion. Higher is better.
+
+    Parameters
+    ----------
+    data_objects : np.ndarray
+        (n, d) array
+    assignments : np.ndarray
+        Cluster label of each data object, such as the output of kmeans
+
+    Returns
+    -------
+    float
+    """
+    data_objects = np.asarray(data_objects, dtype=float)
+    indices, total_clusters = _internal_validation_labels(data_objects, assignments)
+    centroids, counts = _cluster_means(data_objects, indices, total_clusters)
+    mean = np.mean(data_objects, axis=0)
+    between_dispersion = np.sum(counts * np.sum(np.power(centroids - mean, 2), axis=1))
+    within_dispersion = np.sum(np.power(data_objects - centroids[indices], 2))
+    if within_dispersion == 0:
+        return 1.0
+    total_data_objects = indices.size
+    return float(between_dispersion * (total_data_objects - total_clusters)
+                 / (within_dispersion * (total_clusters - 1)))
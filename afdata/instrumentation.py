@@ -0,0 +1,100 @@
+import time
+import tracemalloc
+
+
+def start_peak_memory():
+    """Starts measuring the peak memory allocated from now on.
+
+    Allocations are traced with tracemalloc, which slows down code that
+    allocates heavily, so only measure when the stats are wanted. If tracing
+    is already on it is left on, but its peak is reset.
+
+    Returns
+    -------
+    tuple
+        Token to pass to stop_peak_memory
+    """
+    started = not tracemalloc.is_tracing()
+    if started:
+        tracemalloc.start()
+    else:
+        tracemalloc.reset_peak()
+    return started, tracemalloc.get_traced_memory()[0]
+
+
+def stop_peak_memory(token):
+    """Returns the peak memory allocated since start_peak_memory.
+
+    Parameters
+    ----------
+    token : tuple
+        From start_peak_memory
+
+    Returns
+    -------
+    int
+        Bytes above what was allocated when measuring started
+    """
+    started, start_memory = token
+    peak_memory = tracemalloc.get_traced_memory()[1] - start_memory
+    if started:
+        tracemalloc.stop()
+    return peak_memory
+
+
+class Recorder(object):
+    """Times the phases of a step, such as an iteration or a level, and
+    reports its stats to a callback.
+
+    Without a callback every method does nothing, so the same loop can run
+    with or without stats. Peak memory is only measured with trace_memory.
+
+    Parameters
+    ----------
+    callback : callable or None
+    trace_memory : bool, optional
+        Adds the peak memory of each step, from start_peak_memory, to its
+        stats as 'peak_memory'. Otherwise 'peak_memory' is None.
+    """
+
+    def __init__(self, callback, trace_memory=False):
+        self.callback = callback
+        self.trace_memory = trace_memory
+        self._time = None
+        self._memory = None
+
+    def start(self):
+        """Starts timing a step."""
+        if self.callback is None:
+            return
+        if self.trace_memory:
+            self._memory = start_peak_memory()
+        self._time = time.perf_counter()
+
+    def lap(self):
+        """Returns the seconds since the step started or the last lap.
+
+        Returns
+        -------
+        float
+            0.0 without a callback
+        """
+        if self.callback is None:
+            return 0.0
+        now = time.perf_counter()
+        elapsed = now - self._time
+        self._time = now
+        return elapsed
+
+    def report(self, stats):
+        """Adds 'peak_memory' to the stats of the step and passes them to the
+        callback.
+
+        Parameters
+        ----------
+        stats : dict
+        """
+        if self.callback is None:
+            return
+        stats['peak_memory'] = stop_peak_memory(self._memory) if self.trace_memory else None
+        self.callback(stats)
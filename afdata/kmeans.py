@@ -1,39 +1,1038 @@
+import contextlib
+from concurrent.futures import ProcessPoolExecutor
+
 import numpy as np
 
+from afdata import instrumentation, parallel
+from afdata.utils import check_random_state
+
+
+def _distances(data_objects, centroids):
+    """Returns an (n, k) array of the Euclidean distances between each data
+    object and each centroid.
+
+    Built one centroid at a time so memory stays at O(n * d) on top of the
+    result.
+    """
+    distances = np.empty((data_objects.shape[0], centroids.shape[0]))
+    for j, centroid in enumerate(centroids):
+        distances[:, j] = np.sqrt(np.sum(np.power(np.subtract(data_objects, centroid), 2), axis=1))
+    return distances
+
+
 def euclidean_distance(a, b):
     subtracted_elements_squared = np.power(np.subtract(a, b), 2)
     elements_total = np.sum(subtracted_elements_squared)
     return np.sqrt(elements_total)
 
-def calculate_centroids(data_objects, assignments):
-    clusters = np.unique(assignments)
-    centroids = np.zeros((clusters.size, data_objects.shape[1]))
-    for i, cluster in enumerate(clusters):
-        cluster_data_objects = data_objects[assignments == cluster]
-        centroids[i] = np.divide(np.sum(cluster_data_objects, axis=0), cluster_data_objects.shape[0])
-    return centroids
+
+def _cluster_sums(data_objects, assignments, total_clusters):
+    """Returns the sum and count of the data objects in each cluster, from a
+    single pass over the assignments.
+    """
+    counts = np.bincount(assignments, minlength=total_clusters)
+    sums = np.empty((total_clusters, data_objects.shape[1]))
+    for dimension in range(data_objects.shape[1]):
+        sums[:, dimension] = np.bincount(assignments, weights=data_objects[:, dimension], minlength=total_clusters)
+    return sums, counts
+
+
+def _centroids_from_sums(sums, counts, centroids):
+    # Empty clusters keep their previous centroid
+    updated_centroids = np.array(centroids, dtype=float)
+    clusters = counts > 0
+    updated_centroids[clusters] = np.divide(sums[clusters], counts[clusters, np.newaxis])
+    return updated_centroids
+
+
+def calculate_centroids(data_objects, assignments, centroids=None):
+    """Returns the mean of the data objects assigned to each cluster.
+
+    Parameters
+    ----------
+    data_objects : np.ndarray
+        (n, d) array
+    assignments : np.ndarray
+        Index of the cluster each data object is assigned to
+    centroids : np.ndarray, optional
+        Previous (k, d) centroids. Clusters that are empty keep their previous
+        centroid. Without them empty clusters are dropped and the remaining
+        centroids are returned in order of cluster index.
+
+    Returns
+    -------
+    np.ndarray
+    """
+    if centroids is None:
+        clusters, assignments = np.unique(assignments, return_inverse=True)
+        assignments = assignments.ravel()
+        centroids = np.zeros((clusters.size, data_objects.shape[1]))
+    sums, counts = _cluster_sums(data_objects, assignments, centroids.shape[0])
+    return _centroids_from_sums(sums, counts, centroids)
+
+
+# Most memory to spend on the distances of a block of data objects when
+# assigning them
+_ASSIGN_WORKING_MEMORY = 64 * 2 ** 20
+
+
+def _assign_block_size(total_centroids):
+    return max(1, min(_DEFAULT_BLOCK_SIZE, _ASSIGN_WORKING_MEMORY // (8 * max(total_centroids, 1))))
+
 
 def assign_to_centroids(data_objects, centroids):
-    assignments = np.empty((data_objects.shape[0]), dtype=int)
-    for i, data_object in enumerate(data_objects):
-        closest_centroid = 0
-        distance_from_closest = euclidean_distance(data_object, centroids[0])
-        for j, centroid in enumerate(centroids):
-            distance = euclidean_distance(data_object, centroid)
-            if distance < distance_from_closest:
-                closest_centroid = j
-                distance_from_closest = distance
-        assignments[i] = closest_centroid
+    """Returns the index of the nearest centroid for each data object.
+
+    Distances are computed for a block of rows at a time, so memory stays
+    bounded for any number of data objects and centroids.
+    """
+    total_data_objects = data_objects.shape[0]
+    block_size = _assign_block_size(centroids.shape[0])
+    assignments = np.empty(total_data_objects, dtype=np.intp)
+    for start in range(0, total_data_objects, block_size):
+        # argmin keeps the first of equally close centroids, as a strict < scan would
+        assignments[start:start + block_size] = np.argmin(
+            _distances(data_objects[start:start + block_size], centroids), axis=1)
     return assignments
 
-def kmeans(data_objects, k, iterations):
+
+def _count_reassigned(previous_assignments, assignments):
+    if previous_assignments is None:
+        return assignments.size
+    return int(np.count_nonzero(previous_assignments != assignments))
+
+
+class _LloydAssigner(object):
+    """Assigns every data object by computing its distance to all k centroids.
+
+    Assigners keep the current assignments. assign returns how many data
+    objects changed cluster and update_centroids returns the centroids of the
+    current assignments, given the previous ones.
+    """
+
+    def __init__(self, data_objects):
+        self.data_objects = data_objects
+        self.assignments = None
+
+    def assign(self, centroids):
+        assignments = assign_to_centroids(self.data_objects, centroids)
+        reassigned = _count_reassigned(self.assignments, assignments)
+        self.assignments = assignments
+        return reassigned
+
+    def update_centroids(self, centroids):
+        return calculate_centroids(self.data_objects, self.assignments, centroids)
+
+    def close(self):
+        pass
+
+
+class _ElkanAssigner(_LloydAssigner):
+    """Skips distance computations using the triangle inequality (Elkan, 2003).
+
+    Keeps an upper bound on each data object's distance to its own centroid
+    and a lower bound on its distance to every centroid. A distance is only
+    computed when the bounds can't prove that the centroid is further away
+    than the current one, so the assignments are identical to Lloyd's.
+    """
+
+    def __init__(self, data_objects):
+        super().__init__(data_objects)
+        self.centroids = None
+
+    def _reset(self, centroids):
+        distances = _distances(self.data_objects, centroids)
+        assignments = np.argmin(distances, axis=1)
+        reassigned = _count_reassigned(self.assignments, assignments)
+        self.assignments = assignments
+        self.upper = distances[np.arange(distances.shape[0]), assignments]
+        self.lower = distances
+        self.centroids = centroids
+        return reassigned
+
+    def assign(self, centroids):
+        if self.centroids is None:
+            return self._reset(centroids)
+        shifts = np.sqrt(np.sum(np.power(np.subtract(centroids, self.centroids), 2), axis=1))
+        self.centroids = centroids
+        self.upper += shifts[self.assignments]
+        np.subtract(self.lower, shifts, out=self.lower)
+        np.maximum(self.lower, 0, out=self.lower)
+        centroid_distances = _distances(centroids, centroids)
+        half_distances = 0.5 * centroid_distances
+        np.fill_diagonal(centroid_distances, np.inf)
+        half_closest = 0.5 * np.min(centroid_distances, axis=1)
+        # A data object closer to its centroid than half the distance to the
+        # nearest other centroid can't change cluster. Ties aren't skipped
+        # so that the lowest index still wins, as in assign_to_centroids.
+        candidates = np.flatnonzero(self.upper >= half_closest[self.assignments])
+        if candidates.size == 0:
+            return 0
+        data_objects = self.data_objects[candidates]
+        assignments = self.assignments[candidates]
+        # Tighten the upper bounds once, then a centroid is only in play when
+        # neither its lower bound nor half its distance to the current
+        # centroid rules it out.
+        upper = np.sqrt(np.sum(np.power(np.subtract(data_objects, centroids[assignments]), 2), axis=1))
+        self.lower[candidates, assignments] = upper
+        in_play = (upper[:, None] >= self.lower[candidates]) & (upper[:, None] >= half_distances[assignments])
+        in_play[np.arange(candidates.size), assignments] = False
+        pair_rows, pair_columns = np.nonzero(in_play)
+        distances = np.empty(pair_rows.size)
+        # Pairs are gathered in blocks so memory stays bounded like assign_to_centroids
+        block_size = max(1, _ASSIGN_WORKING_MEMORY // (8 * data_objects.shape[1]))
+        for start in range(0, pair_rows.size, block_size):
+            block_rows = pair_rows[start:start + block_size]
+            block_columns = pair_columns[start:start + block_size]
+            distances[start:start + block_size] = np.sqrt(np.sum(np.power(
+                np.subtract(data_objects[block_rows], centroids[block_columns]), 2), axis=1))
+        self.lower[candidates[pair_rows], pair_columns] = distances
+        # The closest computed centroid of each row, lowest index first among
+        # ties, replaces the current one if it is closer or ties with a lower index
+        order = np.lexsort((pair_columns, distances, pair_rows))
+        rows, columns, distances = pair_rows[order], pair_columns[order], distances[order]
+        first = np.ones(rows.size, dtype=bool)
+        first[1:] = rows[1:] != rows[:-1]
+        rows, columns, distances = rows[first], columns[first], distances[first]
+        closer = (distances < upper[rows]) | ((distances == upper[rows]) & (columns < assignments[rows]))
+        assignments[rows[closer]] = columns[closer]
+        upper[rows[closer]] = distances[closer]
+        reassigned = int(np.count_nonzero(assignments != self.assignments[candidates]))
+        self.assignments[candidates] = assignments
+        self.upper[candidates] = upper
+        return reassigned
+
+
+class _HamerlyAssigner(_LloydAssigner):
+    """Skips distance computations using the triangle inequality (Hamerly, 2010).
+
+    Like _ElkanAssigner but with a single lower bound per data object, on the
+    distance to its second closest centroid. Uses O(n) rather than O(n * k)
+    memory for the bounds, which pays off when the dimensionality is low.
+    """
+
+    def __init__(self, data_objects):
+        super().__init__(data_objects)
+        self.centroids = None
+
+    def _closest(self, candidates, centroids):
+        # Sets the bounds of the candidates from their distances to every
+        # centroid, a block at a time
+        assignments = np.empty(candidates.size, dtype=np.intp)
+        block_size = _assign_block_size(centroids.shape[0])
+        for start in range(0, candidates.size, block_size):
+            block = candidates[start:start + block_size]
+            distances = _distances(self.data_objects[block], centroids)
+            rows = np.arange(block.size)
+            block_assignments = np.argmin(distances, axis=1)
+            self.upper[block] = distances[rows, block_assignments]
+            distances[rows, block_assignments] = np.inf
+            self.lower[block] = np.min(distances, axis=1)
+            assignments[start:start + block_size] = block_assignments
+        return assignments
+
+    def _reset(self, centroids):
+        total_data_objects = self.data_objects.shape[0]
+        self.upper = np.empty(total_data_objects)
+        self.lower = np.empty(total_data_objects)
+        assignments = self._closest(np.arange(total_data_objects), centroids)
+        reassigned = _count_reassigned(self.assignments, assignments)
+        self.assignments = assignments
+        self.centroids = centroids
+        return reassigned
+
+    def assign(self, centroids):
+        if self.centroids is None:
+            return self._reset(centroids)
+        shifts = np.sqrt(np.sum(np.power(np.subtract(centroids, self.centroids), 2), axis=1))
+        self.centroids = centroids
+        self.upper += shifts[self.assignments]
+        # The second closest centroid may be any centroid other than a data
+        # object's own, so its bound drops by the largest of their shifts
+        order = np.argsort(shifts)
+        largest_shift = shifts[order[-1]]
+        second_largest_shift = shifts[order[-2]] if shifts.size > 1 else 0
+        self.lower -= np.where(self.assignments == order[-1], second_largest_shift, largest_shift)
+        centroid_distances = _distances(centroids, centroids)
+        np.fill_diagonal(centroid_distances, np.inf)
+        half_closest = 0.5 * np.min(centroid_distances, axis=1)
+        bounds = np.maximum(half_closest[self.assignments], self.lower)
+        candidates = np.flatnonzero(self.upper >= bounds)
+        if candidates.size > 0:
+            self.upper[candidates] = np.sqrt(np.sum(np.power(
+                np.subtract(self.data_objects[candidates], centroids[self.assignments[candidates]]), 2), axis=1))
+            candidates = candidates[self.upper[candidates] >= bounds[candidates]]
+        if candidates.size == 0:
+            return 0
+        assignments = self._closest(candidates, centroids)
+        reassigned = int(np.count_nonzero(assignments != self.assignments[candidates]))
+        self.assignments[candidates] = assignments
+        return reassigned
+
+
+def _assign_blocks(data_objects, assignments, start, stop, centroids, block_size, first_pass):
+    """Assigns rows start to stop of the data objects one block at a time,
+    writing into assignments. Returns the cluster sums and counts and the
+    number of data objects that changed cluster.
+    """
+    total_clusters = centroids.shape[0]
+    sums = np.zeros((total_clusters, data_objects.shape[1]))
+    counts = np.zeros(total_clusters, dtype=int)
+    reassigned = 0
+    for block_start in range(start, stop, block_size):
+        block_stop = min(block_start + block_size, stop)
+        block = np.asarray(data_objects[block_start:block_stop], dtype=float)
+        block_assignments = assign_to_centroids(block, centroids)
+        if first_pass:
+            reassigned += block_assignments.size
+        else:
+            reassigned += int(np.count_nonzero(assignments[block_start:block_stop] != block_assignments))
+        assignments[block_start:block_stop] = block_assignments
+        block_sums, block_counts = _cluster_sums(block, block_assignments, total_clusters)
+        sums += block_sums
+        counts += block_counts
+    return sums, counts, reassigned
+
+
+class _BlockedAssigner(_LloydAssigner):
+    """Streams over the data objects in row blocks.
+
+    Only one block is read into memory at a time. Cluster sums and counts are
+    accumulated while assigning, so updating the centroids doesn't need
+    another pass, and the assignments are written to an output array that can
+    itself be memory mapped.
+    """
+
+    def __init__(self, data_objects, block_size, out=None):
+        super().__init__(data_objects)
+        self.block_size = block_size
+        self.out = out
+
+    def assign(self, centroids):
+        total_data_objects = self.data_objects.shape[0]
+        first_pass = self.assignments is None
+        if first_pass:
+            self.assignments = self.out if self.out is not None else np.empty(total_data_objects, dtype=int)
+        self.sums, self.counts, reassigned = _assign_blocks(
+            self.data_objects, self.assignments, 0, total_data_objects, centroids, self.block_size, first_pass)
+        return reassigned
+
+    def update_centroids(self, centroids):
+        return _centroids_from_sums(self.sums, self.counts, centroids)
+
+
+class _FilterAssigner(_LloydAssigner):
+    """Assigns whole KD-tree nodes at a time with the filtering algorithm
+    (Kanungo et al., 2002).
+
+    A KD-tree is built over the data objects once. Each node caches its
+    bounding box and the sum and count of its data objects. Walking down the
+    tree, a centroid is dropped from a node's candidates when every point of
+    the box is further from it than from the candidate closest to the box's
+    midpoint. Once one candidate is left the whole node is assigned to it and
+    its cached sum and count go straight into the centroid update, so only
+    leaves near cluster boundaries look at individual data objects. Suits
+    low-dimensional data, where most nodes are settled high up the tree.
+
+    Leaves are large, as walking the tree costs Python overhead per node while
+    a leaf is assigned in vectorised blocks. The data objects are copied into
+    tree order, so the tree takes as much memory again as the data objects.
+    """
+
+    # Relative slack that keeps a candidate when the pruning test is too close
+    # to call, so rounding can't make the assignments differ from Lloyd's
+    _prune_tolerance = 1e-9
+
+    # Most data objects in a leaf
+    _leaf_size = 4096
+
+    def __init__(self, data_objects):
+        self.data_objects = data_objects
+        self._labels = None
+        self._build_tree()
+
+    def _build_tree(self):
+        # The data objects are copied into tree order, so every node is a
+        # contiguous slice and nothing is gathered while walking the tree
+        self._sorted = np.array(self.data_objects, dtype=float, order='F')
+        self.order = np.arange(self._sorted.shape[0])
+        starts, stops, children = [0], [self.order.size], [None]
+        # Nodes are added breadth first, so children come after their parent
+        node = 0
+        while node < len(starts):
+            start, stop = starts[node], stops[node]
+            node += 1
+            if stop - start <= self._leaf_size:
+                continue
+            node_data_objects = self._sorted[start:stop]
+            extents = np.ptp(node_data_objects, axis=0)
+            # Identical data objects can't be split, so they stay in one leaf
+            if np.max(extents) == 0:
+                continue
+            # Split at the median of the widest dimension
+            middle = (start + stop) // 2
+            split = np.argpartition(node_data_objects[:, np.argmax(extents)], middle - start)
+            self._sorted[start:stop] = node_data_objects[split]
+            self.order[start:stop] = self.order[start:stop][split]
+            children[node - 1] = (len(starts), len(starts) + 1)
+            starts += [start, middle]
+            stops += [middle, stop]
+            children += [None, None]
+        self._starts = np.array(starts)
+        self._stops = np.array(stops)
+        self._children = children
+        self._counts = self._stops - self._starts
+        # Leaves cover the data objects in order, so their boxes and sums
+        # reduce over consecutive slices, and every parent combines its
+        # children's
+        leaves = np.array([i for i, node_children in enumerate(children) if node_children is None])
+        leaves = leaves[np.argsort(self._starts[leaves])]
+        shape = (len(starts), self._sorted.shape[1])
+        self._lower, self._upper, self._sums = np.empty(shape), np.empty(shape), np.empty(shape)
+        self._lower[leaves] = np.minimum.reduceat(self._sorted, self._starts[leaves], axis=0)
+        self._upper[leaves] = np.maximum.reduceat(self._sorted, self._starts[leaves], axis=0)
+        self._sums[leaves] = np.add.reduceat(self._sorted, self._starts[leaves], axis=0)
+        for node in range(len(starts) - 1, -1, -1):
+            if children[node] is not None:
+                left, right = children[node]
+                self._lower[node] = np.minimum(self._lower[left], self._lower[right])
+                self._upper[node] = np.maximum(self._upper[left], self._upper[right])
+                self._sums[node] = self._sums[left] + self._sums[right]
+
+    def _filter(self, centroids, candidates, node):
+        """Returns the candidates that may be closest to some data object in
+        the node's bounding box, in index order.
+        """
+        candidate_centroids = centroids[candidates]
+        midpoint = 0.5 * (self._lower[node] + self._upper[node])
+        closest = np.argmin(np.sum(np.power(np.subtract(candidate_centroids, midpoint), 2), axis=1))
+        # The vertex of the box furthest in the direction from the closest
+        # candidate to another is the point most in that candidate's favour
+        towards = np.subtract(candidate_centroids, candidate_centroids[closest])
+        vertices = np.where(towards > 0, self._upper[node], self._lower[node])
+        distances = np.sum(np.power(np.subtract(candidate_centroids, vertices), 2), axis=1)
+        closest_distances = np.sum(np.power(np.subtract(candidate_centroids[closest], vertices), 2), axis=1)
+        keep = distances <= closest_distances * (1 + self._prune_tolerance)
+        keep[closest] = True
+        return candidates[keep]
+
+    def assign(self, centroids):
+        total_clusters = centroids.shape[0]
+        labels = np.empty(self.order.size, dtype=int)
+        self.sums = np.zeros((total_clusters, self.data_objects.shape[1]))
+        self.counts = np.zeros(total_clusters, dtype=int)
+        stack = [(0, np.arange(total_clusters))]
+        while stack:
+            node, candidates = stack.pop()
+            if candidates.size > 1:
+                candidates = self._filter(centroids, candidates, node)
+            start, stop = self._starts[node], self._stops[node]
+            if candidates.size == 1:
+                labels[start:stop] = candidates[0]
+                self.sums[candidates[0]] += self._sums[node]
+                self.counts[candidates[0]] += self._counts[node]
+            elif self._children[node] is None:
+                node_data_objects = self._sorted[start:stop]
+                node_labels = candidates[assign_to_centroids(node_data_objects, centroids[candidates])]
+                labels[start:stop] = node_labels
+                sums, counts = _cluster_sums(node_data_objects, node_labels, total_clusters)
+                self.sums += sums
+                self.counts += counts
+            else:
+                left, right = self._children[node]
+                stack.extend([(right, candidates), (left, candidates)])
+        reassigned = _count_reassigned(self._labels, labels)
+        self._labels = labels
+        return reassigned
+
+    @property
+    def assignments(self):
+        if self._labels is None:
+            return None
+        assignments = np.empty_like(self._labels)
+        assignments[self.order] = self._labels
+        return assignments
+
+    def update_centroids(self, centroids):
+        return _centroids_from_sums(self.sums, self.counts, centroids)
+
+
+class _ShardedAssigner(_LloydAssigner):
+    """Map-reduce over shards of the data objects in a pool of worker
+    processes.
+
+    The data objects are shared with the workers once. Each iteration a
+    worker assigns its shard to the current centroids and returns only the
+    shard's k cluster sums and counts, which are then added together here.
+    Assignments are written straight into a shared array.
+    """
+
+    def __init__(self, data_objects, n_shards, block_size=None):
+        self.data_objects = data_objects
+        self.block_size = block_size or _DEFAULT_BLOCK_SIZE
+        self._first_pass = True
+        total_data_objects = data_objects.shape[0]
+        bounds = np.linspace(0, total_data_objects, n_shards + 1).astype(int)
+        self._shards = list(zip(bounds[:-1], bounds[1:]))
+        self._stack = contextlib.ExitStack()
+        try:
+            data_objects_handle = self._stack.enter_context(parallel.shared_array(data_objects))
+            self._assignments, assignments_handle = self._stack.enter_context(
+                parallel.shared_output((total_data_objects, ), int))
+            self._executor = self._stack.enter_context(ProcessPoolExecutor(
+                n_shards,
+                initializer=_init_shard_worker,
+                initargs=(data_objects_handle, assignments_handle)
+            ))
+        except Exception:
+            self.close()
+            raise
+
+    @property
+    def assignments(self):
+        return self._assignments
+
+    def assign(self, centroids):
+        results = self._executor.map(
+            _shard_worker,
+            [(start, stop, centroids, self.block_size, self._first_pass) for start, stop in self._shards]
+        )
+        self._first_pass = False
+        self.sums, self.counts, reassigned = 0, 0, 0
+        for sums, counts, shard_reassigned in results:
+            self.sums = self.sums + sums
+            self.counts = self.counts + counts
+            reassigned += shard_reassigned
+        return reassigned
+
+    def update_centroids(self, centroids):
+        return _centroids_from_sums(self.sums, self.counts, centroids)
+
+    def close(self):
+        # The shared array can only be released once nothing refers to it
+        if getattr(self, '_assignments', None) is not None:
+            self._assignments = np.array(self._assignments)
+        self._stack.close()
+
+
+_ASSIGNERS = {
+    'lloyd': _LloydAssigner,
+    'elkan': _ElkanAssigner,
+    'hamerly': _HamerlyAssigner,
+    'filter': _FilterAssigner,
+}
+
+
+# Rows per block when streaming over memory mapped data objects
+_DEFAULT_BLOCK_SIZE = 65536
+
+
+def calculate_inertia(data_objects, centroids, assignments, block_size=_DEFAULT_BLOCK_SIZE):
+    """Returns the sum of squared distances between the data objects and their
+    centroids.
+
+    Parameters
+    ----------
+    data_objects : np.ndarray
+        (n, d) array
+    centroids : np.ndarray
+        (k, d) array
+    assignments : np.ndarray
+        Index of the centroid each data object is assigned to
+    block_size : int, optional
+        Number of rows read into memory at a time
+
+    Returns
+    -------
+    float
+    """
+    inertia = 0.0
+    for start in range(0, data_objects.shape[0], block_size):
+        block = np.asarray(data_objects[start:start + block_size], dtype=float)
+        block_centroids = centroids[assignments[start:start + block_size]]
+        inertia += float(np.sum(np.power(np.subtract(block, block_centroids), 2)))
+    return inertia
+
+
+def _initial_centroids(data_objects, k, random_state):
     centroids = np.zeros((0, np.size(data_objects, 1)))
     # Pick the original centroids from the data objects
     for i in range(k):
-        centroids = np.append(centroids, [data_objects[np.random.randint(0, np.size(data_objects, 0))]], axis=0)
-    # Make initial assignments
-    assignments = assign_to_centroids(data_objects, centroids)
-    for i in range(iterations):
-        updated_centroids = calculate_centroids(data_objects, assignments)
-        assignments = assign_to_centroids(data_objects, updated_centroids)
+        centroids = np.append(centroids, [data_objects[random_state.randint(0, np.size(data_objects, 0))]], axis=0)
+    return centroids
+
+
+def _run_kmeans(data_objects, centroids, iterations, algorithm, block_size=None, out=None, n_shards=None,
+                callback=None, trace_memory=False):
+    if n_shards is not None and n_shards > 1:
+        assigner = _ShardedAssigner(data_objects, n_shards, block_size)
+    elif block_size is not None:
+        assigner = _BlockedAssigner(data_objects, block_size, out=out)
+    else:
+        assigner = _ASSIGNERS[algorithm](data_objects)
+    recorder = instrumentation.Recorder(callback, trace_memory)
+    try:
+        # Make initial assignments, reported as iteration 0
+        recorder.start()
+        reassigned = assigner.assign(centroids)
+        recorder.report({
+            'iteration': 0,
+            'reassigned': reassigned,
+            'centroid_shift': 0.0,
+            'update_time': 0.0,
+            'assign_time': recorder.lap(),
+        })
+        for i in range(iterations):
+            recorder.start()
+            new_centroids = assigner.update_centroids(centroids)
+            update_time = recorder.lap()
+            reassigned = assigner.assign(new_centroids)
+            recorder.report({
+                'iteration': i + 1,
+                'reassigned': reassigned,
+                'centroid_shift': float(np.max(np.sqrt(np.sum(np.power(new_centroids - centroids, 2), axis=1)))),
+                'update_time': update_time,
+                'assign_time': recorder.lap(),
+            })
+            centroids = new_centroids
+            # Unchanged assignments give unchanged centroids, so nothing more can move
+            if reassigned == 0:
+                break
+    finally:
+        assigner.close()
+    return assigner.assignments, centroids
+
+
+def _kmeans_restart(data_objects, k, iterations, algorithm, random_state, block_size=None, out=None,
+                    n_shards=None, callback=None, trace_memory=False):
+    centroids = _initial_centroids(data_objects, k, check_random_state(random_state))
+    assignments, centroids = _run_kmeans(
+        data_objects, centroids, iterations, algorithm, block_size, out, n_shards, callback, trace_memory
+    )
+    inertia = calculate_inertia(data_objects, centroids, assignments, block_size or _DEFAULT_BLOCK_SIZE)
+    return assignments, centroids, inertia
+
+
+# Data objects shared with the restart workers, set by _init_restart_worker
+_worker_data_objects = None
+
+
+def _init_restart_worker(handle):
+    global _worker_data_objects
+    _worker_data_objects = parallel.attach(handle)
+
+
+def _restart_worker(arguments):
+    *arguments, record_stats, trace_memory = arguments
+    if not record_stats:
+        return _kmeans_restart(_worker_data_objects, *arguments) + (None, )
+    # Callbacks can't cross processes, so the stats are replayed by the parent
+    stats = []
+    return _kmeans_restart(
+        _worker_data_objects, *arguments, callback=stats.append, trace_memory=trace_memory) + (stats, )
+
+
+def _restart_callback(callback, restart):
+    if callback is None:
+        return None
+
+    def report(stats):
+        stats['restart'] = restart
+        callback(stats)
+    return report
+
+
+# Assignments shared with the shard workers, set by _init_shard_worker
+_worker_assignments = None
+
+
+def _init_shard_worker(data_objects_handle, assignments_handle):
+    global _worker_data_objects, _worker_assignments
+    _worker_data_objects = parallel.attach(data_objects_handle)
+    _worker_assignments = parallel.attach(assignments_handle)
+
+
+def _shard_worker(arguments):
+    start, stop, centroids, block_size, first_pass = arguments
+    return _assign_blocks(_worker_data_objects, _worker_assignments, start, stop, centroids, block_size, first_pass)
+
+
+def _prepare_data_objects(data_objects, algorithm, block_size, n_jobs=1, n_shards=None):
+    if algorithm not in _ASSIGNERS:
+        raise ValueError('algorithm must be one of {0}'.format(', '.join(sorted(_ASSIGNERS))))
+    if isinstance(data_objects, str):
+        data_objects = np.load(data_objects, mmap_mode='r')
+    if block_size is None and isinstance(data_objects, np.memmap):
+        block_size = _DEFAULT_BLOCK_SIZE
+    if block_size is not None and algorithm != 'lloyd':
+        raise ValueError('Only the lloyd algorithm can stream over row blocks')
+    if n_shards is not None and n_shards > 1:
+        if algorithm != 'lloyd':
+            raise ValueError('Only the lloyd algorithm can be sharded')
+        if parallel.effective_n_jobs(n_jobs) > 1:
+            raise ValueError('n_jobs must be 1 when n_shards is greater than 1')
+    return data_objects, block_size
+
+
+def _fit_kmeans(data_objects, k, iterations, algorithm, n_init, n_jobs, random_state, block_size, out, n_shards,
+                callback=None, trace_memory=False):
+    if n_init <= 0:
+        raise ValueError('n_init must be greater than 0')
+    if isinstance(out, str):
+        out = np.lib.format.open_memmap(out, mode='w+', dtype=int, shape=(data_objects.shape[0], ))
+    random_state = check_random_state(random_state)
+    restart_states = random_state.randint(np.iinfo(np.int32).max, size=n_init) if n_init > 1 else []
+    n_jobs = min(parallel.effective_n_jobs(n_jobs), n_init)
+    if n_init == 1:
+        restarts = [_kmeans_restart(data_objects, k, iterations, algorithm, random_state, block_size, out, n_shards,
+                                    _restart_callback(callback, 0), trace_memory)]
+    elif n_jobs == 1:
+        restarts = [_kmeans_restart(data_objects, k, iterations, algorithm, state, block_size, None, n_shards,
+                                    _restart_callback(callback, restart), trace_memory)
+                    for restart, state in enumerate(restart_states)]
+    else:
+        with parallel.shared_array(data_objects) as handle, \
+                ProcessPoolExecutor(n_jobs, initializer=_init_restart_worker, initargs=(handle, )) as executor:
+            restarts = list(executor.map(
+                _restart_worker,
+                [(k, iterations, algorithm, state, block_size, callback is not None, trace_memory)
+                 for state in restart_states]
+            ))
+        for restart, (_, _, _, stats) in enumerate(restarts):
+            for iteration_stats in stats or []:
+                _restart_callback(callback, restart)(iteration_stats)
+        restarts = [restart[:3] for restart in restarts]
+    # min keeps the first of equal inertias, so ties resolve the same way
+    # whatever the number of workers
+    assignments, centroids, inertia = min(restarts, key=lambda restart: restart[2])
+    if out is not None and assignments is not out:
+        out[:] = assignments
+        assignments = out
+    return assignments, centroids, inertia
+
+
+def kmeans(data_objects, k, iterations, algorithm='lloyd', n_init=1, n_jobs=1, random_state=None, block_size=None,
+           out=None, n_shards=None, callback=None, trace_memory=False):
+    """Clusters the data objects with k-means.
+
+    Parameters
+    ----------
+    data_objects : np.ndarray or str
+        (n, d) array. An np.memmap, or the path of a .npy file which is then
+        memory mapped, is streamed over in row blocks so data sets larger than
+        memory can be clustered.
+    k : int
+        Number of clusters
+    iterations : int
+        Maximum number of centroid updates. Stops early once the assignments
+        no longer change.
+    algorithm : str, optional
+        'lloyd' computes every distance on every iteration. 'elkan' and
+        'hamerly' use the triangle inequality to skip distances that can't
+        change an assignment, which removes most of the work once clusters
+        settle. 'elkan' skips more but keeps n * k bounds, 'hamerly' keeps 2n
+        and suits low dimensions. 'filter' builds a KD-tree once and assigns
+        whole nodes at a time, which beats 'lloyd' on low-dimensional data
+        and pulls ahead of 'hamerly' as n and k grow. All of them give the
+        same assignments.
+    n_init : int, optional
+        Number of restarts from different initial centroids. The assignments
+        with the lowest inertia are returned.
+    n_jobs : int, optional
+        Number of worker processes to run the restarts in. -1 uses every CPU.
+        The data objects are placed in shared memory once rather than pickled
+        for each worker.
+    random_state : int or np.random.RandomState, optional
+        Seeds the initial centroids. With n_init > 1 each restart gets its own
+        seed drawn from it, so results don't depend on n_jobs.
+    block_size : int, optional
+        Number of rows to hold in memory at a time. Setting it streams over
+        any array, and it defaults to 65536 for memory mapped data objects.
+        Only the 'lloyd' algorithm can stream.
+    out : np.ndarray or str, optional
+        Array, or path of a .npy file to memory map, that the assignments are
+        written to and returned in.
+    n_shards : int, optional
+        Splits the data objects into this many shards, each assigned by its
+        own worker process on every iteration. Only the k cluster sums and
+        counts of each shard come back to be combined into the new centroids.
+        Only the 'lloyd' algorithm can be sharded and restarts then run one
+        after another, so n_jobs must be 1.
+    callback : callable, optional
+        Called with a dict of stats after every iteration of every restart:
+        'restart', 'iteration' (0 is the initial assignment), 'reassigned',
+        'centroid_shift' (largest distance a centroid moved), 'update_time'
+        and 'assign_time' in seconds, and 'peak_memory'. Restarts run in
+        worker processes are reported once they finish.
+    trace_memory : bool, optional
+        Sets 'peak_memory' in the callback stats to the most bytes allocated
+        at once during the iteration in the process running it, instead of
+        None. Allocations are traced with tracemalloc, which slows k-means
+        down.
+
+    Returns
+    -------
+    np.ndarray
+        Index of the centroid each data object is assigned to
+    """
+    data_objects, block_size = _prepare_data_objects(data_objects, algorithm, block_size, n_jobs, n_shards)
+    assignments, centroids, inertia = _fit_kmeans(
+        data_objects, k, iterations, algorithm, n_init, n_jobs, random_state, block_size, out, n_shards, callback,
+        trace_memory)
     return assignments
+
+
+class KMeans(object):
+    """k-means that keeps its centroids, so new data objects can be scored
+    without clustering everything again.
+
+    A cluster that ends up empty keeps its previous centroid, so there are
+    always k centroids.
+
+    Parameters
+    ----------
+    k : int
+        Number of clusters
+    iterations : int, optional
+        Maximum number of centroid updates per fit
+    algorithm, n_init, n_jobs, random_state, block_size, n_shards : optional
+        As for kmeans
+    warm_start : bool, optional
+        When True, fitting a fitted model starts from its current centroids
+        instead of random ones, e.g. to refresh it with new data objects.
+
+    Attributes
+    ----------
+    centroids : np.ndarray
+        (k, d) array, None until fitted
+    inertia : float
+        Sum of squared distances from the fitted data objects to their
+        centroids
+    assignments : np.ndarray
+        Index of the centroid each fitted data object is assigned to
+    """
+
+    def __init__(self, k, iterations=300, algorithm='lloyd', n_init=1, n_jobs=1, random_state=None,
+                 block_size=None, n_shards=None, warm_start=False):
+        if k <= 0:
+            raise ValueError('k must be greater than 0')
+        self.k = k
+        self.iterations = iterations
+        self.algorithm = algorithm
+        self.n_init = n_init
+        self.n_jobs = n_jobs
+        self.random_state = check_random_state(random_state)
+        self.block_size = block_size
+        self.n_shards = n_shards
+        self.warm_start = warm_start
+        self.centroids = None
+        self.inertia = None
+        self.assignments = None
+
+    def fit(self, data_objects):
+        """Clusters the data objects.
+
+        Parameters
+        ----------
+        data_objects : np.ndarray or str
+            (n, d) array, np.memmap or path of a .npy file
+
+        Returns
+        -------
+        KMeans
+        """
+        data_objects, block_size = _prepare_data_objects(
+            data_objects, self.algorithm, self.block_size, self.n_jobs, self.n_shards)
+        if self.warm_start and self.centroids is not None:
+            assignments, centroids = _run_kmeans(
+                data_objects, self.centroids, self.iterations, self.algorithm, block_size, None, self.n_shards)
+            inertia = calculate_inertia(data_objects, centroids, assignments, block_size or _DEFAULT_BLOCK_SIZE)
+        else:
+            assignments, centroids, inertia = _fit_kmeans(
+                data_objects, self.k, self.iterations, self.algorithm, self.n_init, self.n_jobs,
+                self.random_state, block_size, None, self.n_shards)
+        self.assignments, self.centroids, self.inertia = assignments, centroids, inertia
+        return self
+
+    def _check_fitted(self):
+        if self.centroids is None:
+            raise ValueError('KMeans must be fitted before it can score data objects')
+
+    def predict(self, data_objects):
+        """Returns the index of the nearest centroid for each data object.
+
+        Parameters
+        ----------
+        data_objects : np.ndarray
+            (n, d) array
+
+        Returns
+        -------
+        np.ndarray
+        """
+        self._check_fitted()
+        return assign_to_centroids(np.asarray(data_objects, dtype=float), self.centroids)
+
+    def transform(self, data_objects):
+        """Returns the distance from each data object to each centroid.
+
+        Parameters
+        ----------
+        data_objects : np.ndarray
+            (n, d) array
+
+        Returns
+        -------
+        np.ndarray
+            (n, k) array
+        """
+        self._check_fitted()
+        return _distances(np.asarray(data_objects, dtype=float), self.centroids)
+
+
+class MiniBatchKMeans(object):
+    """Mini-batch k-means.
+
+    Each update draws a random batch of data objects, assigns it to the
+    nearest centroids and moves every centroid towards the mean of its new
+    members with a per-centroid learning rate of 1 / (data objects seen so
+    far). The cost of an update depends on the batch size, not on the size of
+    the data set.
+
+    Parameters
+    ----------
+    k : int
+        Number of clusters
+    batch_size : int, optional
+        Number of data objects drawn per update by fit
+    iterations : int, optional
+        Number of updates made by fit
+    random_state : int or np.random.RandomState, optional
+
+    Attributes
+    ----------
+    centroids : np.ndarray
+        (k, d) array, None until the first update
+    counts : np.ndarray
+        Number of data objects that have been assigned to each centroid
+    """
+
+    def __init__(self, k, batch_size=100, iterations=100, random_state=None):
+        if k <= 0:
+            raise ValueError('k must be greater than 0')
+        if batch_size <= 0:
+            raise ValueError('batch_size must be greater than 0')
+        self.k = k
+        self.batch_size = batch_size
+        self.iterations = iterations
+        self.random_state = check_random_state(random_state)
+        self.centroids = None
+        self.counts = None
+
+    def partial_fit(self, batch):
+        """Updates the centroids from a single batch of data objects.
+
+        The first batch also seeds the centroids, so it must contain at least
+        k data objects.
+
+        Parameters
+        ----------
+        batch : np.ndarray
+            (m, d) array
+
+        Returns
+        -------
+        MiniBatchKMeans
+        """
+        batch = np.asarray(batch, dtype=float)
+        if self.centroids is None:
+            if batch.shape[0] < self.k:
+                raise ValueError('The first batch must contain at least k data objects')
+            seeds = self.random_state.choice(batch.shape[0], self.k, replace=False)
+            self.centroids = batch[seeds].copy()
+            self.counts = np.zeros(self.k)
+        assignments = np.argmin(_distances(batch, self.centroids), axis=1)
+        batch_counts = np.bincount(assignments, minlength=self.k)
+        batch_sums = np.zeros_like(self.centroids)
+        np.add.at(batch_sums, assignments, batch)
+        # Applying the per-point update c += (x - c) / count sequentially over
+        # a centroid's m new members is the same as this single step
+        updated = batch_counts > 0
+        self.counts[updated] += batch_counts[updated]
+        self.centroids[updated] += np.divide(
+            batch_sums[updated] - batch_counts[updated, np.newaxis] * self.centroids[updated],
+            self.counts[updated, np.newaxis]
+        )
+        return self
+
+    def _distinct_indices(self, total):
+        # choice without replacement permutes all total indices, so draw k
+        # with replacement and redraw the duplicates, which costs O(k)
+        indices = np.unique(self.random_state.randint(0, total, self.k))
+        while indices.size < self.k:
+            indices = np.unique(np.concatenate([
+                indices,
+                self.random_state.randint(0, total, self.k - indices.size)
+            ]))
+        return indices
+
+    def fit(self, data_objects):
+        """Updates the centroids from random batches of the data objects.
+
+        Parameters
+        ----------
+        data_objects : np.ndarray
+            (n, d) array
+
+        Returns
+        -------
+        MiniBatchKMeans
+        """
+        total_data_objects = data_objects.shape[0]
+        if self.centroids is None:
+            if total_data_objects < self.k:
+                raise ValueError('data_objects must contain at least k data objects')
+            self.partial_fit(data_objects[self._distinct_indices(total_data_objects)])
+        for i in range(self.iterations):
+            batch = self.random_state.randint(0, total_data_objects, self.batch_size)
+            self.partial_fit(data_objects[batch])
+        return self
+
+    def predict(self, data_objects):
+        """Returns the index of the nearest centroid for each data object.
+
+        Parameters
+        ----------
+        data_objects : np.ndarray
+            (n, d) array
+
+        Returns
+        -------
+        np.ndarray
+        """
+        if self.centroids is None:
+            raise ValueError('MiniBatchKMeans must be fitted before predict is called')
+        return assign_to_centroids(np.asarray(data_objects, dtype=float), self.centroids)
+
+
+def minibatch_kmeans(data_objects, k, iterations, batch_size=100, random_state=None):
+    """Clusters the data objects with mini-batch k-means.
+
+    Parameters
+    ----------
+    data_objects : np.ndarray
+        (n, d) array
+    k : int
+        Number of clusters
+    iterations : int
+        Number of mini-batch updates
+    batch_size : int, optional
+    random_state : int or np.random.RandomState, optional
+
+    Returns
+    -------
+    np.ndarray
+        Index of the centroid each data object is assigned to
+    """
+    model = MiniBatchKMeans(k, batch_size=batch_size, iterations=iterations, random_state=random_state)
+    return model.fit(data_objects).predict(data_objects)
@@ -0,0 +1,114 @@
+import contextlib
+import mmap
+import os
+from multiprocessing import shared_memory
+
+import numpy as np
+
+# Segments attached by this process, kept open for as long as it lives
+_attached = {}
+
+
+def effective_n_jobs(n_jobs):
+    """Returns the number of worker processes to use for n_jobs.
+
+    Parameters
+    ----------
+    n_jobs : int or None
+        None means 1. Negative values count back from the number of CPUs, so
+        -1 means all of them.
+
+    Returns
+    -------
+    int
+    """
+    if n_jobs is None:
+        return 1
+    if n_jobs == 0:
+        raise ValueError('n_jobs must not be 0')
+    if n_jobs < 0:
+        return max((os.cpu_count() or 1) + 1 + n_jobs, 1)
+    return n_jobs
+
+
+@contextlib.contextmanager
+def shared_array(array):
+    """Makes an array available to worker processes without pickling it.
+
+    An np.memmap that maps a whole file is shared by its file name, so workers
+    map the same pages. Anything else is copied once into a shared memory
+    segment, which is released when the context exits.
+
+    Parameters
+    ----------
+    array : np.ndarray
+
+    Yields
+    ------
+    tuple
+        Handle to pass to attach in a worker process
+    """
+    if isinstance(array, np.memmap) and isinstance(array.base, mmap.mmap) and array.flags.c_contiguous:
+        yield ('memmap', array.filename, array.offset, array.shape, array.dtype.str)
+        return
+    array = np.ascontiguousarray(array)
+    segment = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+    try:
+        np.ndarray(array.shape, dtype=array.dtype, buffer=segment.buf)[...] = array
+        yield ('shm', segment.name, 0, array.shape, array.dtype.str)
+    finally:
+        segment.close()
+        segment.unlink()
+
+
+@contextlib.contextmanager
+def shared_output(shape, dtype):
+    """Allocates a zeroed array in shared memory that worker processes can
+    write into.
+
+    Copy out anything that is needed and drop every reference to the array
+    before the context exits, as the segment can't be released while it is
+    still in use.
+
+    Parameters
+    ----------
+    shape : tuple of int
+    dtype : np.dtype
+
+    Yields
+    ------
+    np.ndarray
+        The array, for this process
+    tuple
+        Handle to pass to attach in a worker process
+    """
+    dtype = np.dtype(dtype)
+    segment = shared_memory.SharedMemory(create=True, size=max(int(np.prod(shape)) * dtype.itemsize, 1))
+    try:
+        array = np.ndarray(shape, dtype=dtype, buffer=segment.buf)
+        array[...] = 0
+        handle = ('shm', segment.name, 0, tuple(shape), dtype.str)
+        yield array, handle
+    finally:
+        del array
+        segment.close()
+        segment.unlink()
+
+
+def attach(handle):
+    """Returns the array behind a handle from shared_array or shared_output.
+
+    Parameters
+    ----------
+    handle : tuple
+
+    Returns
+    -------
+    np.ndarray
+    """
+    kind, name, offset, shape, dtype = handle
+    if kind == 'memmap':
+        return np.memmap(name, dtype=dtype, mode='r', offset=offset, shape=shape)
+    if name not in _attached:
+        _attached[name] = shared_memory.SharedMemory(name=name)
+    return np.ndarray(shape, dtype=dtype, buffer=_attached[name].buf)
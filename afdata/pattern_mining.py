@@ -1,14 +1,116 @@
+import collections
 import itertools
 import operator
 
+from afdata import instrumentation
 
-def support(transactions, itemsets):
+
+def _weighted(transactions, weights):
+    # Pairs each transaction with its weight, 1 when there are no weights, and
+    # returns the total weight
+    if weights is None:
+        return zip(transactions, itertools.repeat(1)), len(transactions)
+    if len(weights) != len(transactions):
+        raise ValueError('weights must have one weight for each transaction')
+    return zip(transactions, weights), sum(weights)
+
+
+def _strip_infrequent_items(transactions, weights, min_support):
+    item_counts = collections.Counter()
+    for transaction, weight in zip(transactions, weights):
+        for item in set(itertools.chain.from_iterable(transaction)):
+            item_counts[item] += weight
+    total_weight = sum(weights)
+    return frozenset(item for item, count in item_counts.items() if count / total_weight >= min_support)
+
+
+def _collapse(transactions, weights):
+    counts = collections.OrderedDict()
+    for transaction, weight in zip(transactions, weights):
+        counts[transaction] = counts.get(transaction, 0) + weight
+    return list(counts), list(counts.values())
+
+
+def compress_transactions(transactions, weights=None, min_support=None):
+    """Collapses duplicate transactions into weighted transactions.
+
+    Each transaction is canonicalised to a tuple of its sorted, distinct items
+    and duplicates are replaced by one transaction weighted by how many there
+    were. Every support function and miner gives the same supports for the
+    compressed transactions and weights as for the originals, while scanning
+    each distinct transaction once.
+
+    Parameters
+    ----------
+    transactions : list of list
+        Items must be orderable
+    weights : list of int, optional
+        Weights of already weighted transactions
+    min_support : float, optional
+        Also strips items whose support is below min_support, which can't be
+        in a frequent itemset of that min_support, so more transactions
+        collapse together. Transactions left empty keep their weight.
+
+    Returns
+    -------
+    list of tuple
+    list of int
+        Weight of each transaction
+    """
+    weights = [1] * len(transactions) if weights is None else list(weights)
+    transactions = [tuple(sorted(set(transaction))) for transaction in transactions]
+    if min_support is not None:
+        frequent_items = _strip_infrequent_items([[transaction] for transaction in transactions], weights, min_support)
+        transactions = [tuple(item for item in transaction if item in frequent_items) for transaction in transactions]
+    return _collapse(transactions, weights)
+
+
+def compress_sequence_transactions(transactions, weights=None, min_support=None):
+    """Collapses duplicate sequence transactions into weighted transactions.
+
+    Each itemset of a sequence is canonicalised to a tuple of its sorted,
+    distinct items, and duplicate sequences are collapsed as
+    compress_transactions collapses transactions.
+
+    Parameters
+    ----------
+    transactions : list of list of list
+        Items must be orderable
+    weights : list of int, optional
+        Weights of already weighted transactions
+    min_support : float, optional
+        Also strips items that fewer than min_support of the sequences
+        contain, so more sequences collapse together
+
+    Returns
+    -------
+    list of tuple of tuple
+    list of int
+        Weight of each transaction
+    """
+    weights = [1] * len(transactions) if weights is None else list(weights)
+    transactions = [tuple(tuple(sorted(set(itemset))) for itemset in transaction) for transaction in transactions]
+    if min_support is not None:
+        frequent_items = _strip_infrequent_items(transactions, weights, min_support)
+        # Itemsets left empty are kept, as is_subsequence matches the itemsets
+        # of a sequence at consecutive positions
+        transactions = [
+            tuple(tuple(item for item in itemset if item in frequent_items) for itemset in transaction)
+            for transaction in transactions
+        ]
+    return _collapse(transactions, weights)
+
+
+def support(transactions, itemsets, weights=None):
     """Returns the percentages of transactions that contain the itemsets.
 
     Parameters
     ----------
     transactions : list of list
     itemsets : list of frozenset
+    weights : list of int, optional
+        Number of transactions each transaction stands for, as returned by
+        compress_transactions
 
     Returns
     -------
@@ -18,12 +120,12 @@ def support(transactions, itemsets):
     counts = {}
     for itemset in itemsets:
         counts[itemset] = 0
-    for transaction in transactions:
+    weighted_transactions, total_transactions = _weighted(transactions, weights)
+    for transaction, weight in weighted_transactions:
         for itemset in itemsets:
             if itemset.issubset(transaction):
-                counts[itemset] += 1
+                counts[itemset] += weight
     supports = {}
-    total_transactions = len(transactions)
     for itemset, count in counts.items():
         supports[itemset] = count / total_transactions
     return supports
@@ -58,7 +160,7 @@ def is_subsequence(sequence, candidate):
     return False
 
 
-def sequence_support(transactions, sequences):
+def sequence_support(transactions, sequences, weights=None):
     """Returns the percentages of transactions that contain the sequences.
 
     Parameters
@@ -66,6 +168,9 @@ def sequence_support(transactions, sequences):
     transactions : list of list of list
     sequences : list of tuple of frozenset
         Each sequence is an ordered list of itemsets
+    weights : list of int, optional
+        Number of transactions each transaction stands for, as returned by
+        compress_sequence_transactions
 
     Returns
     -------
@@ -76,18 +181,18 @@ def sequence_support(transactions, sequences):
     counts = {}
     for sequence in sequences:
         counts[sequence] = 0
-    for transaction in transactions:
+    weighted_transactions, total_transactions = _weighted(transactions, weights)
+    for transaction, weight in weighted_transactions:
         for sequence in sequences:
             if is_subsequence(transaction, sequence):
-                counts[sequence] += 1
-    total_transactions = len(transactions)
+                counts[sequence] += weight
     supports = {}
     for sequence, count in counts.items():
         supports[sequence] = count / total_transactions
     return supports
 
 
-def confidence(transactions, itemset_a, itemset_b):
+def confidence(transactions, itemset_a, itemset_b, weights=None):
     """Returns the percentage of transactions that contain both itemset_a and
     itemset_b.
 
@@ -96,21 +201,39 @@ def confidence(transactions, itemset_a, itemset_b):
     transactions : list of list
     itemset_a : frozenset
     itemset_b : frozenset
+    weights : list of int, optional
+        Number of transactions each transaction stands for
 
     Returns
     -------
     float
         Percentage of transactions that contain both itemset_a and itemset_b
     """
-    itemset_a_support = support(transactions, [itemset_a])[itemset_a]
+    itemset_a_support = support(transactions, [itemset_a], weights)[itemset_a]
     if itemset_a_support == 0:
         return 0
     itemset_a_union_b = itemset_a.union(itemset_b)
-    return support(transactions, [itemset_a_union_b])[itemset_a_union_b] \
+    return support(transactions, [itemset_a_union_b], weights)[itemset_a_union_b] \
         / itemset_a_support
 
 
-def get_frequent_length_k_itemsets(transactions, min_support=0.2, k=1, frequent_sub_itemsets=None):
+def _report_level(recorder, k, total_generated, total_counted, total_frequent, total_transactions, times):
+    generate_time, prune_time, count_time = times
+    recorder.report({
+        'k': k,
+        'candidates_generated': total_generated,
+        'candidates_pruned': total_generated - total_counted,
+        'candidates_counted': total_counted,
+        'frequent': total_frequent,
+        'transactions_scanned': total_transactions,
+        'generate_time': generate_time,
+        'prune_time': prune_time,
+        'count_time': count_time,
+    })
+
+
+def get_frequent_length_k_itemsets(transactions, min_support=0.2, k=1, frequent_sub_itemsets=None, callback=None,
+                                   weights=None, trace_memory=False):
     """Returns all the length-k itemsets, from the transactions, that satisfy
     min_support.
 
@@ -126,6 +249,18 @@ def get_frequent_length_k_itemsets(transactions, min_support=0.2, k=1, frequent_
         Facilitates candidate pruning by the Apriori property. Length-k itemset
         candidates that aren't supersets of at least 1 frequent sub-itemset are
         pruned.
+    callback : callable, optional
+        Called with a dict of stats for the level: 'k', 'candidates_generated',
+        'candidates_pruned', 'candidates_counted', 'frequent',
+        'transactions_scanned', 'generate_time', 'prune_time' and 'count_time'
+        in seconds, and 'peak_memory'
+    weights : list of int, optional
+        Number of transactions each transaction stands for, as returned by
+        compress_transactions
+    trace_memory : bool, optional
+        Sets 'peak_memory' in the callback stats to the most bytes allocated
+        at once during the level, instead of None. Allocations are traced with
+        tracemalloc, which slows mining down.
 
     Returns
     -------
@@ -136,6 +271,8 @@ def get_frequent_length_k_itemsets(transactions, min_support=0.2, k=1, frequent_
         raise ValueError('min_support must be greater than 0 and less than or equal to 1.0')
     if k <= 0:
         raise ValueError('k must be greater than 0')
+    recorder = instrumentation.Recorder(callback, trace_memory)
+    recorder.start()
     all_items = set()
     if frequent_sub_itemsets:
         for sub_itemset in frequent_sub_itemsets:
@@ -146,6 +283,7 @@ def get_frequent_length_k_itemsets(transactions, min_support=0.2, k=1, frequent_
     all_length_k_itemsets = itertools.product(all_items, repeat=k)
     all_length_k_itemsets = frozenset(frozenset(itemset) for itemset in all_length_k_itemsets)
     all_length_k_itemsets = frozenset(filter(lambda itemset: len(itemset) == k, all_length_k_itemsets))
+    generate_time = recorder.lap()
     # Remove itemsets that don't have a frequent sub-itemset to take advantage
     # of the Apriori property
     pruned_length_k_itemsets = all_length_k_itemsets
@@ -158,17 +296,22 @@ def get_frequent_length_k_itemsets(transactions, min_support=0.2, k=1, frequent_
                     has_frequent_sub_itemset = True
             if has_frequent_sub_itemset:
                 pruned_length_k_itemsets.add(itemset)
+    prune_time = recorder.lap()
     frequent_itemsets = []
     frequent_supports = []
-    supports = support(transactions, pruned_length_k_itemsets)
+    supports = support(transactions, pruned_length_k_itemsets, weights)
     for itemset, itemset_support in supports.items():
         if itemset_support >= min_support:
             frequent_itemsets.append(itemset)
             frequent_supports.append(itemset_support)
+    _report_level(
+        recorder, k, len(all_length_k_itemsets), len(pruned_length_k_itemsets), len(frequent_itemsets),
+        len(transactions), (generate_time, prune_time, recorder.lap())
+    )
     return frequent_itemsets, frequent_supports
 
 
-def get_frequent_itemsets(transactions, min_support=0.2):
+def get_frequent_itemsets(transactions, min_support=0.2, callback=None, weights=None, trace_memory=False):
     """Returns all the itemsets, from the transactions, that satisfy
     min_support.
 
@@ -180,6 +323,15 @@ def get_frequent_itemsets(transactions, min_support=0.2):
     min_support : float, optional
         From 0.0 to 1.0. Percentage of transactions that should contain an
         itemset for it to be considered frequent.
+    callback : callable, optional
+        Called with the stats of each level, as get_frequent_length_k_itemsets
+        reports them
+    weights : list of int, optional
+        Number of transactions each transaction stands for, as returned by
+        compress_transactions
+    trace_memory : bool, optional
+        Measures the peak memory of each level, as in
+        get_frequent_length_k_itemsets
 
     Returns
     -------
@@ -190,7 +342,10 @@ def get_frequent_itemsets(transactions, min_support=0.2):
     length_k_frequent_itemsets, length_k_supports = get_frequent_length_k_itemsets(
         transactions,
         min_support=min_support,
-        k=k
+        k=k,
+        callback=callback,
+        weights=weights,
+        trace_memory=trace_memory
     )
     frequent_itemsets = length_k_frequent_itemsets
     supports = length_k_supports
@@ -200,7 +355,10 @@ def get_frequent_itemsets(transactions, min_support=0.2):
             transactions,
             min_support=min_support,
             k=k,
-            frequent_sub_itemsets=length_k_frequent_itemsets
+            frequent_sub_itemsets=length_k_frequent_itemsets,
+            callback=callback,
+            weights=weights,
+            trace_memory=trace_memory
         )
         frequent_itemsets += length_k_frequent_itemsets
         supports += length_k_supports
@@ -255,7 +413,8 @@ def generate_candidate_sequences(length_k_sequences):
     return frozenset(candidates)
 
 
-def get_frequent_length_k_sequences(transactions, min_support=0.2, k=1, frequent_sub_sequences=None):
+def get_frequent_length_k_sequences(transactions, min_support=0.2, k=1, frequent_sub_sequences=None, callback=None,
+                                    weights=None, trace_memory=False):
     """Returns all the sequences, from the transactions, that satisfy
     min_support.
 
@@ -271,12 +430,23 @@ def get_frequent_length_k_sequences(transactions, min_support=0.2, k=1, frequent
         Facilitates candidate pruning by the Apriori property. Length-k sequence
         candidates that aren't supersets of at least 1 frequent sub-sequences
         are pruned.
+    callback : callable, optional
+        Called with a dict of stats for the level, as
+        get_frequent_length_k_itemsets reports them
+    weights : list of int, optional
+        Number of transactions each transaction stands for, as returned by
+        compress_sequence_transactions
+    trace_memory : bool, optional
+        Measures the peak memory of each level, as in
+        get_frequent_length_k_itemsets
 
     Returns
     -------
     list of frozenset
     list of float
     """
+    recorder = instrumentation.Recorder(callback, trace_memory)
+    recorder.start()
     items = set()
     for transaction in transactions:
         for itemset in transaction:
@@ -284,17 +454,23 @@ def get_frequent_length_k_sequences(transactions, min_support=0.2, k=1, frequent
     sequences = []
     for item in items:
         sequences.append((frozenset([item]), ))
-    supports = sequence_support(transactions, sequences)
+    generate_time = recorder.lap()
+    supports = sequence_support(transactions, sequences, weights)
     frequent_length_k_sequences = []
     frequent_supports = []
     for sequence, support in supports.items():
         if support >= 0.2:
             frequent_length_k_sequences.append(sequence)
             frequent_supports.append(support)
+    # Nothing is pruned
+    _report_level(
+        recorder, 1, len(sequences), len(sequences), len(frequent_length_k_sequences), len(transactions),
+        (generate_time, 0.0, recorder.lap())
+    )
     return frequent_length_k_sequences, frequent_supports
 
 
-def get_frequent_sequences(transactions, prefix=None):
+def get_frequent_sequences(transactions, prefix=None, callback=None, weights=None, trace_memory=False):
     """Returns all the sequences, from the transactions, that satisfy
     min_support.
 
@@ -308,6 +484,15 @@ def get_frequent_sequences(transactions, prefix=None):
     min_support : float, optional
         From 0.0 to 1.0. Percentage of transactions that should contain a
         sequence for it to be considered frequent.
+    callback : callable, optional
+        Called with a dict of stats for each level, as
+        get_frequent_length_k_itemsets reports them
+    weights : list of int, optional
+        Number of transactions each transaction stands for, as returned by
+        compress_sequence_transactions
+    trace_memory : bool, optional
+        Measures the peak memory of each level, as in
+        get_frequent_length_k_itemsets
 
     Returns
     -------
@@ -316,6 +501,8 @@ def get_frequent_sequences(transactions, prefix=None):
     list of float
         Supports of the frequent sequences
     """
+    recorder = instrumentation.Recorder(callback, trace_memory)
+    recorder.start()
     items = set()
     for transaction in transactions:
         for itemset in transaction:
@@ -323,9 +510,15 @@ def get_frequent_sequences(transactions, prefix=None):
     sequences = []
     for item in items:
         sequences.append((frozenset([item]), ))
-    supports = sequence_support(transactions, sequences)
+    generate_time = recorder.lap()
+    supports = sequence_support(transactions, sequences, weights)
     sorted_supports = sorted(supports.items(), key=operator.itemgetter(1), reverse=True)
     frequent_length_1_sequences = [sequence for sequence, support in sorted_supports if support >= 0.2]
+    # Nothing is pruned
+    _report_level(
+        recorder, 1, len(sequences), len(sequences), len(frequent_length_1_sequences), len(transactions),
+        (generate_time, 0.0, recorder.lap())
+    )
     for frequent_length_1_sequence in frequent_length_1_sequences:
         print(frequent_length_1_sequence)
     return [], []
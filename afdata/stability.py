@@ -0,0 +1,141 @@
+import collections
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from afdata import cluster_validation, parallel
+from afdata.kmeans import kmeans
+from afdata.utils import check_random_state
+
+
+# Per-cluster and overall stability of a k-means clustering. Intervals are
+# (low, high) percentile intervals over the bootstrap resamples.
+StabilityReport = collections.namedtuple(
+    'StabilityReport',
+    ['assignments', 'cluster_stability', 'cluster_interval', 'overall', 'overall_interval']
+)
+
+
+def _bootstrap_fit(data_objects, k, iterations, algorithm, n_init, state):
+    random_state = np.random.RandomState(state)
+    sample = random_state.randint(data_objects.shape[0], size=data_objects.shape[0])
+    assignments = kmeans(data_objects[sample], k, iterations, algorithm, n_init, random_state=random_state)
+    # Duplicates of a data object are identical, so they share a label
+    sample, first = np.unique(sample, return_index=True)
+    return sample, assignments[first]
+
+
+# Data objects shared with the bootstrap workers, set by _init_bootstrap_worker
+_worker_data_objects = None
+
+
+def _init_bootstrap_worker(handle):
+    global _worker_data_objects
+    _worker_data_objects = parallel.attach(handle)
+
+
+def _bootstrap_worker(arguments):
+    return _bootstrap_fit(_worker_data_objects, *arguments)
+
+
+def _cluster_jaccard(reference_assignments, assignments):
+    # Jaccard coefficient of each reference cluster with its most similar
+    # cluster in the other clustering, over the data objects in both. Clusters
+    # with no such data objects are NaN.
+    table = cluster_validation.contingency_table(reference_assignments, assignments, sparse=True)
+    unions = table.row_sums[table.rows] + table.column_sums[table.columns] - table.counts
+    similarities = np.zeros(table.row_sums.size)
+    np.maximum.at(similarities, table.rows, table.counts / unions)
+    return np.unique(reference_assignments), similarities
+
+
+def _interval(values, confidence, axis=None):
+    tail = 50 * (1 - confidence)
+    return np.moveaxis(np.nanpercentile(values, [tail, 100 - tail], axis=axis), 0, -1)
+
+
+def stability(data_objects, k, n_boot=20, n_jobs=1, iterations=100, algorithm='lloyd', n_init=1,
+              metrics=('jaccard', 'normalised_mutual_info'), confidence=0.95, random_state=None):
+    """Estimates how stable the k-means clustering of the data objects is.
+
+    k-means is refitted on n_boot bootstrap resamples. Each reference cluster
+    is scored by its Jaccard coefficient with the most similar bootstrap
+    cluster, and the clusterings of every pair of resamples are compared with
+    the metrics. Comparisons only use the data objects both sides share and
+    are built from their contingency table, so each is O(n) rather than
+    O(n^2).
+
+    Parameters
+    ----------
+    data_objects : np.ndarray
+    k : int
+    n_boot : int, optional
+        Number of bootstrap resamples, at least 2
+    n_jobs : int, optional
+        Number of worker processes fitting resamples. -1 uses every CPU.
+    iterations : int, optional
+    algorithm : str, optional
+    n_init : int, optional
+        Number of k-means restarts for each fit
+    metrics : sequence of str, optional
+        Keys of cluster_validation.validate used for the overall stability
+    confidence : float, optional
+        Coverage of the percentile intervals
+    random_state : int or np.random.RandomState, optional
+
+    Returns
+    -------
+    StabilityReport
+        assignments is the clustering of all the data objects. cluster_stability
+        is the mean Jaccard coefficient of each of its clusters and
+        cluster_interval a (k, 2) array. overall and overall_interval map each
+        metric to its mean over pairs of resamples and to a (low, high) tuple.
+    """
+    if n_boot < 2:
+        raise ValueError('n_boot must be at least 2')
+    if not 0 < confidence < 1:
+        raise ValueError('confidence must be between 0 and 1')
+    data_objects = np.asarray(data_objects)
+    random_state = check_random_state(random_state)
+    reference_assignments = kmeans(data_objects, k, iterations, algorithm, n_init, random_state=random_state)
+    states = random_state.randint(np.iinfo(np.int32).max, size=n_boot)
+    n_jobs = min(parallel.effective_n_jobs(n_jobs), n_boot)
+    if n_jobs == 1:
+        fits = [_bootstrap_fit(data_objects, k, iterations, algorithm, n_init, state) for state in states]
+    else:
+        with parallel.shared_array(data_objects) as handle, \
+                ProcessPoolExecutor(n_jobs, initializer=_init_bootstrap_worker, initargs=(handle, )) as executor:
+            fits = list(executor.map(
+                _bootstrap_worker,
+                [(k, iterations, algorithm, n_init, state) for state in states]
+            ))
+
+    # -1 marks data objects left out of a resample
+    bootstrap_assignments = np.full((n_boot, data_objects.shape[0]), -1, dtype=np.int64)
+    for assignments, (sample, labels) in zip(bootstrap_assignments, fits):
+        assignments[sample] = labels
+
+    clusters = np.unique(reference_assignments)
+    cluster_similarities = np.full((n_boot, clusters.size), np.nan)
+    for similarities, (sample, labels) in zip(cluster_similarities, fits):
+        present, jaccard = _cluster_jaccard(reference_assignments[sample], labels)
+        similarities[np.searchsorted(clusters, present)] = jaccard
+
+    pair_scores = collections.defaultdict(list)
+    for i in range(n_boot):
+        for j in range(i + 1, n_boot):
+            shared = (bootstrap_assignments[i] >= 0) & (bootstrap_assignments[j] >= 0)
+            report = cluster_validation.validate(
+                bootstrap_assignments[i][shared], bootstrap_assignments[j][shared], metrics
+            )
+            for metric in metrics:
+                pair_scores[metric].append(report[metric])
+
+    return StabilityReport(
+        reference_assignments,
+        np.nanmean(cluster_similarities, axis=0),
+        _interval(cluster_similarities, confidence, axis=0),
+        dict((metric, float(np.mean(pair_scores[metric]))) for metric in metrics),
+        dict((metric, tuple(float(bound) for bound in _interval(pair_scores[metric], confidence)))
+             for metric in metrics)
+    )
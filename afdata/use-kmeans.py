@@ -1,6 +1,6 @@
 import numpy as np
 import os
-from kmeans import kmeans
+from afdata.kmeans import kmeans
 
 # Read in data
 f = open('afdata/places.txt', 'r')
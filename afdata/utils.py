@@ -0,0 +1,20 @@
+import numpy as np
+
+
+def check_random_state(random_state):
+    """Returns a RandomState for the seed, falling back to np.random's global
+    state when no seed is given.
+
+    Parameters
+    ----------
+    random_state : int, np.random.RandomState or None
+
+    Returns
+    -------
+    np.random.RandomState
+    """
+    if random_state is None:
+        return np.random.mtrand._rand
+    if isinstance(random_state, np.random.RandomState):
+        return random_state
+    return np.random.RandomState(random_state)
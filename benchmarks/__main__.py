@@ -0,0 +1,109 @@
+"""Runs the benchmarks without network access or extra dependencies.
+
+Benchmarks follow the asv layout: classes in bench_*.py modules with params,
+param_names, an optional setup and time_* methods. Each time_* method is run
+for every combination of params, and the best wall clock time and the peak
+memory traced while it ran are reported.
+
+    python -m benchmarks [--filter SUBSTRING] [--repeat N] [--output FILE]
+"""
+import argparse
+import importlib
+import inspect
+import itertools
+import json
+import os
+import time
+import tracemalloc
+
+
+def _benchmark_classes():
+    directory = os.path.dirname(os.path.abspath(__file__))
+    for file_name in sorted(os.listdir(directory)):
+        if file_name.startswith('bench_') and file_name.endswith('.py'):
+            module = importlib.import_module('benchmarks.' + file_name[:-3])
+            for _, benchmark_class in inspect.getmembers(module, inspect.isclass):
+                if benchmark_class.__module__ == module.__name__:
+                    yield module.__name__.split('.')[-1], benchmark_class
+
+
+def _param_combinations(benchmark_class):
+    params = getattr(benchmark_class, 'params', [])
+    if not params:
+        return [()]
+    # A single list of params is shorthand for one parameter
+    if not isinstance(params, tuple):
+        params = (params, )
+    return list(itertools.product(*params))
+
+
+def _measure(benchmark, method, param_combination, repeat):
+    times = []
+    for i in range(repeat):
+        start = time.perf_counter()
+        method(*param_combination)
+        times.append(time.perf_counter() - start)
+    # Traced separately, as tracing slows down allocation heavy code
+    tracemalloc.start()
+    try:
+        method(*param_combination)
+        _, peak_memory = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return min(times), peak_memory
+
+
+def run(name_filter=None, repeat=3):
+    """Runs the benchmarks whose names contain name_filter.
+
+    Parameters
+    ----------
+    name_filter : str, optional
+    repeat : int, optional
+        Number of timed runs, of which the fastest is reported
+
+    Returns
+    -------
+    list of dict
+        Name, params, time in seconds and peak memory in bytes of each
+        benchmark
+    """
+    results = []
+    for module_name, benchmark_class in _benchmark_classes():
+        for method_name in sorted(dir(benchmark_class)):
+            if not method_name.startswith('time_'):
+                continue
+            name = '.'.join([module_name, benchmark_class.__name__, method_name])
+            if name_filter and name_filter not in name:
+                continue
+            for param_combination in _param_combinations(benchmark_class):
+                benchmark = benchmark_class()
+                if hasattr(benchmark, 'setup'):
+                    benchmark.setup(*param_combination)
+                seconds, peak_memory = _measure(benchmark, getattr(benchmark, method_name), param_combination, repeat)
+                result = {
+                    'name': name,
+                    'params': dict(zip(getattr(benchmark_class, 'param_names', []), param_combination)),
+                    'time': seconds,
+                    'peak_memory': peak_memory,
+                }
+                print('{0} {1}: {2:.4f} s, {3:.1f} MiB'.format(
+                    name,
+                    ', '.join('{0}={1}'.format(*param) for param in result['params'].items()),
+                    seconds,
+                    peak_memory / 2 ** 20
+                ), flush=True)
+                results.append(result)
+    return results
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Runs the afdata benchmarks.')
+    parser.add_argument('--filter', help='only run benchmarks whose names contain this')
+    parser.add_argument('--repeat', type=int, default=3, help='number of timed runs of each benchmark')
+    parser.add_argument('--output', help='also write the results to this JSON file')
+    arguments = parser.parse_args()
+    benchmark_results = run(arguments.filter, arguments.repeat)
+    if arguments.output:
+        with open(arguments.output, 'w') as output_file:
+            json.dump(benchmark_results, output_file, indent=2)
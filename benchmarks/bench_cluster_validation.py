@@ -0,0 +1,24 @@
+import numpy as np
+
+from afdata import cluster_validation
+
+
+class ExternalValidation(object):
+    params = ([100000, 1000000], [10, 1000])
+    param_names = ['total_data_objects', 'total_labels']
+
+    def setup(self, total_data_objects, total_labels):
+        random_state = np.random.RandomState(0)
+        self.ground_truth = random_state.randint(total_labels, size=total_data_objects)
+        # Agrees with the ground truth on about half of the data objects
+        self.clustering = np.where(
+            random_state.rand(total_data_objects) < 0.5,
+            self.ground_truth,
+            random_state.randint(total_labels, size=total_data_objects)
+        )
+
+    def time_calculate_normalised_mutual_info(self, total_data_objects, total_labels):
+        cluster_validation.calculate_normalised_mutual_info(self.ground_truth, self.clustering)
+
+    def time_calculate_jaccard_coefficient(self, total_data_objects, total_labels):
+        cluster_validation.calculate_jaccard_coefficient(self.ground_truth, self.clustering)
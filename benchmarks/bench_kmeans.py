@@ -0,0 +1,13 @@
+from afdata import kmeans
+from benchmarks import generators
+
+
+class Kmeans(object):
+    params = ([10000, 100000], ['lloyd', 'elkan', 'hamerly', 'filter'])
+    param_names = ['total_data_objects', 'algorithm']
+
+    def setup(self, total_data_objects, algorithm):
+        self.data_objects, _ = generators.gaussian_blobs(total_data_objects, k=8, random_state=0)
+
+    def time_kmeans(self, total_data_objects, algorithm):
+        kmeans.kmeans(self.data_objects, 8, 50, algorithm=algorithm, random_state=0)
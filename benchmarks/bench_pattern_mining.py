@@ -0,0 +1,39 @@
+import itertools
+
+from afdata import pattern_mining
+from benchmarks import generators
+
+
+class Itemsets(object):
+    params = [1000, 5000]
+    param_names = ['total_transactions']
+
+    def setup(self, total_transactions):
+        self.transactions = generators.quest_baskets(
+            total_transactions, total_items=40, average_length=6, random_state=0
+        )
+        items = sorted(set(itertools.chain.from_iterable(self.transactions)))
+        self.candidates = [frozenset(itemset) for itemset in itertools.combinations(items, 2)]
+
+    def time_get_frequent_itemsets(self, total_transactions):
+        pattern_mining.get_frequent_itemsets(self.transactions, min_support=0.1)
+
+    def time_get_frequent_itemsets_compressed(self, total_transactions):
+        transactions, weights = pattern_mining.compress_transactions(self.transactions, min_support=0.1)
+        pattern_mining.get_frequent_itemsets(transactions, min_support=0.1, weights=weights)
+
+    def time_support(self, total_transactions):
+        pattern_mining.support(self.transactions, self.candidates)
+
+
+class Sequences(object):
+    params = [1000, 5000]
+    param_names = ['total_sessions']
+
+    def setup(self, total_sessions):
+        self.transactions = generators.sessions(total_sessions, random_state=0)
+        items = range(20)
+        self.candidates = [(frozenset([a]), frozenset([b])) for a, b in itertools.product(items, repeat=2)]
+
+    def time_sequence_support(self, total_sessions):
+        pattern_mining.sequence_support(self.transactions, self.candidates)
@@ -0,0 +1,149 @@
+"""Synthetic data sets for the benchmarks.
+
+Every generator takes a random_state so that the data, and so the work a
+benchmark does, is the same from run to run.
+"""
+import numpy as np
+
+from afdata.utils import check_random_state
+
+
+def _patterns(random_state, total_patterns, total_items, average_length, correlation):
+    # Each pattern shares an exponentially distributed fraction of its items
+    # with the previous one, as in the IBM Quest generator
+    patterns = []
+    previous = np.array([], dtype=int)
+    for i in range(total_patterns):
+        length = min(max(random_state.poisson(average_length - 1) + 1, 1), total_items)
+        total_shared = min(int(round(min(random_state.exponential(correlation), 1) * length)), previous.size)
+        pattern = set(random_state.choice(previous, total_shared, replace=False).tolist()) if total_shared else set()
+        while len(pattern) < length:
+            pattern.add(int(random_state.randint(total_items)))
+        patterns.append(sorted(pattern))
+        previous = np.array(patterns[-1])
+    weights = random_state.exponential(size=total_patterns)
+    corruptions = np.clip(random_state.normal(0.5, 0.1, size=total_patterns), 0, 1)
+    return patterns, weights / np.sum(weights), corruptions
+
+
+def _corrupt(random_state, pattern, corruption):
+    # Drops items from the pattern while a coin with the pattern's corruption
+    # level comes up heads
+    pattern = list(pattern)
+    while pattern and random_state.rand() < corruption:
+        pattern.pop(random_state.randint(len(pattern)))
+    return pattern
+
+
+def quest_baskets(total_transactions, total_items=100, average_length=10, total_patterns=50,
+                  average_pattern_length=4, correlation=0.5, random_state=None):
+    """Returns market basket transactions in the style of the IBM Quest
+    generator.
+
+    Transactions are unions of corrupted copies of a pool of potentially
+    frequent itemsets, so they contain frequent itemsets of several lengths.
+
+    Parameters
+    ----------
+    total_transactions : int
+    total_items : int, optional
+    average_length : float, optional
+        Mean number of items in a transaction
+    total_patterns : int, optional
+        Size of the pool of potentially frequent itemsets
+    average_pattern_length : float, optional
+    correlation : float, optional
+        Mean fraction of items a pattern shares with the previous one
+    random_state : int or np.random.RandomState, optional
+
+    Returns
+    -------
+    list of list
+    """
+    random_state = check_random_state(random_state)
+    patterns, weights, corruptions = _patterns(
+        random_state, total_patterns, total_items, average_pattern_length, correlation
+    )
+    transactions = []
+    for length in np.maximum(random_state.poisson(average_length, size=total_transactions), 1):
+        transaction = set()
+        while len(transaction) < length:
+            i = random_state.choice(total_patterns, p=weights)
+            transaction.update(_corrupt(random_state, patterns[i], corruptions[i]))
+            if not transaction:
+                transaction.add(int(random_state.randint(total_items)))
+        transactions.append(sorted(transaction))
+    return transactions
+
+
+def sessions(total_sessions, total_items=50, average_length=6, total_patterns=20, average_pattern_length=3,
+             average_itemset_length=2, random_state=None):
+    """Returns sessions, ordered lists of itemsets, built from a pool of
+    potentially frequent sequences.
+
+    Parameters
+    ----------
+    total_sessions : int
+    total_items : int, optional
+    average_length : float, optional
+        Mean number of itemsets in a session
+    total_patterns : int, optional
+        Size of the pool of potentially frequent sequences
+    average_pattern_length : float, optional
+        Mean number of itemsets in a pattern
+    average_itemset_length : float, optional
+    random_state : int or np.random.RandomState, optional
+
+    Returns
+    -------
+    list of list of list
+    """
+    random_state = check_random_state(random_state)
+    itemsets, _, _ = _patterns(random_state, total_patterns * 2, total_items, average_itemset_length, 0.5)
+    patterns = []
+    for i in range(total_patterns):
+        length = max(random_state.poisson(average_pattern_length - 1) + 1, 1)
+        patterns.append([itemsets[j] for j in random_state.randint(len(itemsets), size=length)])
+    weights = random_state.exponential(size=total_patterns)
+    weights /= np.sum(weights)
+    transactions = []
+    for length in np.maximum(random_state.poisson(average_length, size=total_sessions), 1):
+        transaction = []
+        while len(transaction) < length:
+            # Patterns are interleaved with noise itemsets, and corrupted by
+            # dropping some of their itemsets
+            pattern = patterns[random_state.choice(total_patterns, p=weights)]
+            for itemset in pattern:
+                if random_state.rand() < 0.8:
+                    transaction.append(list(itemset))
+            if random_state.rand() < 0.5:
+                transaction.append([int(random_state.randint(total_items))])
+        transactions.append(transaction[:length])
+    return transactions
+
+
+def gaussian_blobs(total_data_objects, total_features=2, k=8, spread=1.0, random_state=None):
+    """Returns data objects drawn from k isotropic Gaussians.
+
+    Parameters
+    ----------
+    total_data_objects : int
+    total_features : int, optional
+    k : int, optional
+    spread : float, optional
+        Standard deviation of each Gaussian. Centres are drawn uniformly from
+        [-10, 10] in every feature.
+    random_state : int or np.random.RandomState, optional
+
+    Returns
+    -------
+    np.ndarray
+        (total_data_objects, total_features) data objects
+    np.ndarray
+        Index of the Gaussian each data object was drawn from
+    """
+    random_state = check_random_state(random_state)
+    centres = random_state.uniform(-10, 10, size=(k, total_features))
+    labels = random_state.randint(k, size=total_data_objects)
+    data_objects = centres[labels] + random_state.normal(scale=spread, size=(total_data_objects, total_features))
+    return data_objects, labels
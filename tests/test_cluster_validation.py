@@ -0,0 +1,276 @@
+import unittest
+import numpy as np
+import afdata.cluster_validation as cluster_validation
+
+ground_truth = np.array([0, 0, 0, 1, 1, 1, 2, 2])
+data_objects = np.array([[0.0, 0.0], [0.0, 1.0], [1.0, 0.0], [4.0, 4.0], [4.0, 5.0], [5.0, 4.0], [9.0, 0.0],
+                         [9.0, 1.0]])
+clustering = np.array([0, 0, 1, 1, 1, 1, 2, 0])
+
+
+def count_pairs(ground_truth, clustering):
+    """Counts the ordered pairs of data objects by comparing every pair."""
+    counts = [0, 0, 0, 0]
+    for i in range(len(clustering)):
+        for j in range(len(clustering)):
+            if i != j:
+                same_cluster = clustering[i] == clustering[j]
+                same_ground_truth = ground_truth[i] == ground_truth[j]
+                if same_cluster and same_ground_truth:
+                    counts[0] += 1
+                elif not same_cluster and not same_ground_truth:
+                    counts[1] += 1
+                elif same_cluster:
+                    counts[2] += 1
+                else:
+                    counts[3] += 1
+    return tuple(counts)
+
+
+class ClusterValidation(unittest.TestCase):
+    def test_returns_contingency_table(self):
+        table = cluster_validation.contingency_table(ground_truth, clustering)
+
+        np.testing.assert_array_equal(table, [[2, 1, 0], [0, 3, 0], [1, 0, 1]])
+
+    def test_returns_sparse_contingency_table(self):
+        table = cluster_validation.contingency_table(ground_truth, clustering, sparse=True)
+
+        np.testing.assert_array_equal(table.rows, [0, 0, 1, 2, 2])
+        np.testing.assert_array_equal(table.columns, [0, 1, 1, 0, 2])
+        np.testing.assert_array_equal(table.counts, [2, 1, 3, 1, 1])
+        np.testing.assert_array_equal(table.row_sums, [3, 3, 2])
+        np.testing.assert_array_equal(table.column_sums, [3, 4, 1])
+
+    def test_returns_cluster_probabilities(self):
+        np.testing.assert_allclose(
+            cluster_validation.calculate_cluster_probabilities(np.array([3, 3, 7, 9])),
+            [0.5, 0.25, 0.25]
+        )
+
+    def test_returns_entropy(self):
+        self.assertAlmostEqual(cluster_validation.calculate_entropy(np.array([0, 0, 1, 1])), np.log10(2))
+
+    def test_returns_mutual_info_for_different_numbers_of_clusters(self):
+        expected = 0
+        for ground_truth_label in np.unique(ground_truth):
+            for label in np.unique(clustering):
+                probability_in_both = np.mean((ground_truth == ground_truth_label) & (clustering == label))
+                if probability_in_both > 0:
+                    expected += probability_in_both * np.log10(probability_in_both / (
+                        np.mean(ground_truth == ground_truth_label) * np.mean(clustering == label)))
+
+        self.assertAlmostEqual(
+            cluster_validation.calculate_mutual_info(ground_truth, np.where(clustering == 2, 3, clustering)),
+            expected
+        )
+        self.assertAlmostEqual(
+            cluster_validation.calculate_mutual_info(ground_truth, np.minimum(clustering, 1)),
+            cluster_validation.calculate_mutual_info(np.minimum(clustering, 1), ground_truth)
+        )
+
+    def test_returns_normalised_mutual_info_of_1_for_same_partition(self):
+        self.assertAlmostEqual(
+            cluster_validation.calculate_normalised_mutual_info(ground_truth, np.array([5, 5, 5, 3, 3, 3, 4, 4])),
+            1
+        )
+
+    def test_returns_pair_confusion(self):
+        self.assertEqual(
+            cluster_validation.pair_confusion(ground_truth, clustering),
+            count_pairs(ground_truth, clustering)
+        )
+
+    def test_returns_pair_confusion_for_random_labels(self):
+        random_state = np.random.RandomState(0)
+        for i in range(5):
+            labels_1 = random_state.randint(0, 4, 40)
+            labels_2 = random_state.randint(0, 6, 40)
+
+            self.assertEqual(
+                cluster_validation.pair_confusion(labels_1, labels_2),
+                count_pairs(labels_1, labels_2)
+            )
+
+    def test_reads_labels_from_column_1_of_2d_clusterings(self):
+        indexed_ground_truth = np.column_stack([np.arange(8), ground_truth])
+        indexed_clustering = np.column_stack([np.arange(8), clustering])
+
+        self.assertEqual(
+            cluster_validation.pair_confusion(indexed_ground_truth, indexed_clustering),
+            cluster_validation.pair_confusion(ground_truth, clustering)
+        )
+
+    def test_returns_jaccard_coefficient(self):
+        true_positives, true_negatives, false_positives, false_negatives = count_pairs(ground_truth, clustering)
+
+        self.assertAlmostEqual(
+            cluster_validation.calculate_jaccard_coefficient(ground_truth, clustering),
+            true_positives / (true_positives + false_positives + false_negatives)
+        )
+
+    def test_returns_validation_report(self):
+        report = cluster_validation.validate(ground_truth, clustering)
+
+        self.assertEqual(sorted(report), sorted([
+            'jaccard', 'rand', 'adjusted_rand', 'fowlkes_mallows', 'mutual_info', 'normalised_mutual_info',
+            'homogeneity', 'completeness', 'v_measure', 'purity',
+        ]))
+        self.assertAlmostEqual(
+            report['jaccard'],
+            cluster_validation.calculate_jaccard_coefficient(ground_truth, clustering)
+        )
+        self.assertAlmostEqual(
+            report['normalised_mutual_info'],
+            cluster_validation.calculate_normalised_mutual_info(ground_truth, clustering)
+        )
+        self.assertAlmostEqual(report['rand'], 15 / 21)
+        self.assertAlmostEqual(report['adjusted_rand'], 7 / 23)
+        self.assertAlmostEqual(report['fowlkes_mallows'], 4 / np.sqrt(7 * 9))
+        self.assertAlmostEqual(report['purity'], 6 / 8)
+
+    def test_returns_perfect_scores_for_same_partition(self):
+        report = cluster_validation.validate(ground_truth, np.array([5, 5, 5, 3, 3, 3, 4, 4]))
+
+        for metric in ['jaccard', 'rand', 'adjusted_rand', 'fowlkes_mallows', 'normalised_mutual_info',
+                       'homogeneity', 'completeness', 'v_measure', 'purity']:
+            self.assertAlmostEqual(report[metric], 1, msg=metric)
+
+    def test_returns_report_per_clustering_in_batch(self):
+        reports = cluster_validation.validate_batch(
+            ground_truth,
+            [ground_truth, clustering, np.zeros(8, dtype=int)],
+            metrics=['adjusted_rand', 'completeness']
+        )
+
+        self.assertEqual(len(reports), 3)
+        self.assertEqual(reports[1], cluster_validation.validate(
+            ground_truth, clustering, metrics=['adjusted_rand', 'completeness']))
+        self.assertAlmostEqual(reports[2]['adjusted_rand'], 0)
+        self.assertAlmostEqual(reports[2]['completeness'], 1)
+
+    def test_validates_plain_list_of_labels_as_one_clustering(self):
+        report = cluster_validation.validate(np.array(ground_truth), list(clustering), metrics=['jaccard'])
+
+        self.assertAlmostEqual(
+            report['jaccard'],
+            cluster_validation.calculate_jaccard_coefficient(ground_truth, clustering)
+        )
+
+    def test_validates_nested_list_of_2_columns_as_one_clustering(self):
+        report = cluster_validation.validate(
+            np.array([[0, 0], [1, 1], [2, 1]]), [[0, 0], [1, 1], [2, 1]], metrics=['rand']
+        )
+
+        self.assertEqual(report, {'rand': 1.0})
+
+    def test_raises_exception_for_2d_clustering_without_2_columns(self):
+        with self.assertRaisesRegex(ValueError, r'Clusterings must be labels or \(n, 2\) arrays'):
+            cluster_validation.validate(ground_truth, np.array([ground_truth, clustering, ground_truth]))
+
+    def test_returns_defined_scores_for_all_singleton_clusterings(self):
+        report = cluster_validation.validate([0, 1, 2], [3, 4, 5])
+
+        for metric in ['jaccard', 'rand', 'adjusted_rand', 'normalised_mutual_info', 'v_measure', 'purity']:
+            self.assertEqual(report[metric], 1.0)
+
+    def test_returns_defined_scores_for_fewer_than_2_data_objects(self):
+        report = cluster_validation.validate([0], [0])
+
+        for metric in ['jaccard', 'rand', 'adjusted_rand', 'normalised_mutual_info']:
+            self.assertEqual(report[metric], 1.0)
+        accumulator = cluster_validation.ContingencyAccumulator().update([0], [0])
+        self.assertEqual(accumulator.jaccard_coefficient(), 1.0)
+        self.assertEqual(accumulator.validate(), report)
+
+    def test_raises_exception_when_metric_unknown(self):
+        with self.assertRaisesRegex(ValueError, 'metrics must be from'):
+            cluster_validation.validate(ground_truth, clustering, metrics=['accuracy'])
+
+    def test_returns_silhouette_coefficient(self):
+        distances = np.sqrt(np.sum(np.power(data_objects[:, np.newaxis] - data_objects[np.newaxis], 2), axis=2))
+        silhouettes = []
+        for i, label in enumerate(ground_truth):
+            same_cluster = ground_truth == label
+            within = np.sum(distances[i, same_cluster]) / (np.sum(same_cluster) - 1)
+            nearest = min(np.mean(distances[i, ground_truth == other_label])
+                          for other_label in np.unique(ground_truth) if other_label != label)
+            silhouettes.append((nearest - within) / max(within, nearest))
+
+        for block_size in [None, 1, 3]:
+            self.assertAlmostEqual(
+                cluster_validation.calculate_silhouette_coefficient(data_objects, ground_truth, block_size=block_size),
+                np.mean(silhouettes)
+            )
+
+    def test_silhouette_coefficient_sample_keeps_every_cluster(self):
+        random_state = np.random.RandomState(0)
+        many_data_objects = np.concatenate([data_objects + random_state.randn(*data_objects.shape) * 0.1
+                                            for i in range(50)])
+        labels = np.tile(ground_truth, 50)
+
+        self.assertAlmostEqual(
+            cluster_validation.calculate_silhouette_coefficient(many_data_objects, labels, sample_size=24,
+                                                                random_state=0),
+            cluster_validation.calculate_silhouette_coefficient(many_data_objects, labels),
+            places=1
+        )
+
+    def test_returns_davies_bouldin_index(self):
+        centroids = np.array([[1 / 3, 1 / 3], [13 / 3, 13 / 3], [9.0, 0.5]])
+        scatter = [np.mean(np.sqrt(np.sum(np.power(data_objects[ground_truth == label] - centroids[label], 2),
+                                          axis=1))) for label in range(3)]
+        expected = np.mean([
+            max((scatter[i] + scatter[j]) / np.sqrt(np.sum(np.power(centroids[i] - centroids[j], 2)))
+                for j in range(3) if j != i)
+            for i in range(3)
+        ])
+
+        self.assertAlmostEqual(cluster_validation.calculate_davies_bouldin_index(data_objects, ground_truth), expected)
+
+    def test_returns_calinski_harabasz_index(self):
+        centroids = np.array([[1 / 3, 1 / 3], [13 / 3, 13 / 3], [9.0, 0.5]])
+        between = np.sum(np.array([3, 3, 2]) * np.sum(np.power(centroids - np.mean(data_objects, axis=0), 2), axis=1))
+        within = np.sum(np.power(data_objects - centroids[ground_truth], 2))
+
+        self.assertAlmostEqual(
+            cluster_validation.calculate_calinski_harabasz_index(data_objects, ground_truth),
+            between * (8 - 3) / (within * (3 - 1))
+        )
+
+    def test_raises_exception_when_only_one_cluster(self):
+        with self.assertRaisesRegex(ValueError, 'Number of clusters must be at least 2'):
+            cluster_validation.calculate_silhouette_coefficient(data_objects, np.zeros(8, dtype=int))
+
+    def test_accumulates_contingency_over_chunks(self):
+        accumulator = cluster_validation.ContingencyAccumulator()
+        for start in range(0, 8, 3):
+            accumulator.update(ground_truth[start:start + 3], clustering[start:start + 3])
+
+        self.assertEqual(accumulator.total_data_objects, 8)
+        self.assertEqual(accumulator.pair_confusion(), cluster_validation.pair_confusion(ground_truth, clustering))
+        self.assertAlmostEqual(
+            accumulator.jaccard_coefficient(),
+            cluster_validation.calculate_jaccard_coefficient(ground_truth, clustering)
+        )
+        self.assertAlmostEqual(
+            accumulator.normalised_mutual_info(),
+            cluster_validation.calculate_normalised_mutual_info(ground_truth, clustering)
+        )
+        self.assertEqual(accumulator.validate(), cluster_validation.validate(ground_truth, clustering))
+
+    def test_accumulator_keeps_one_count_per_label_pair(self):
+        accumulator = cluster_validation.ContingencyAccumulator()
+        for i in range(100):
+            accumulator.update(np.column_stack([np.arange(8), ground_truth]), clustering)
+
+        self.assertEqual(len(accumulator.counts), 5)
+        self.assertEqual(accumulator.counts[(0, 0)], 200)
+
+    def test_raises_exception_when_accumulator_empty(self):
+        with self.assertRaisesRegex(ValueError, 'No data objects have been added'):
+            cluster_validation.ContingencyAccumulator().jaccard_coefficient()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,262 @@
+import os
+import tempfile
+import tracemalloc
+import unittest
+import unittest.mock
+import numpy as np
+import afdata.kmeans as kmeans
+
+blobs = np.array([
+    [0.0, 0.0], [0.1, 0.2], [0.2, 0.1], [-0.1, 0.1],
+    [5.0, 5.0], [5.1, 5.2], [4.9, 5.1], [5.2, 4.9],
+    [10.0, 0.0], [10.1, 0.1], [9.9, -0.1], [10.2, 0.2],
+])
+
+
+def assert_same_partition(testcase, assignments, expected):
+    """Asserts that two assignments group the data objects in the same way,
+    regardless of how the clusters are numbered.
+    """
+    mapping = {}
+    for assignment, expected_assignment in zip(assignments, expected):
+        testcase.assertEqual(mapping.setdefault(assignment, expected_assignment), expected_assignment)
+    testcase.assertEqual(len(set(mapping.values())), len(mapping))
+
+
+def inertia(data_objects, assignments):
+    return kmeans.calculate_inertia(
+        data_objects,
+        kmeans.calculate_centroids(data_objects, assignments),
+        assignments
+    )
+
+
+class Kmeans(unittest.TestCase):
+    def test_finds_the_clusters(self):
+        np.random.seed(3)
+        assignments = kmeans.kmeans(blobs, 3, 10)
+
+        assert_same_partition(self, assignments, [0] * 4 + [1] * 4 + [2] * 4)
+
+    def test_accelerated_algorithms_give_same_assignments_as_lloyd(self):
+        data_objects = np.random.RandomState(0).randn(500, 2)
+        for algorithm in ['elkan', 'hamerly', 'filter']:
+            np.random.seed(1)
+            expected = kmeans.kmeans(data_objects, 20, 50)
+            np.random.seed(1)
+            assignments = kmeans.kmeans(data_objects, 20, 50, algorithm=algorithm)
+
+            np.testing.assert_array_equal(assignments, expected)
+
+    def test_filter_gives_same_assignments_as_lloyd_with_duplicate_data_objects(self):
+        data_objects = np.round(np.random.RandomState(0).randn(500, 2) * 2)
+        np.random.seed(4)
+        expected = kmeans.kmeans(data_objects, 12, 50)
+        np.random.seed(4)
+        # Small leaves so the data objects are spread over a deep tree
+        with unittest.mock.patch.object(kmeans._FilterAssigner, '_leaf_size', 8):
+            assignments = kmeans.kmeans(data_objects, 12, 50, algorithm='filter')
+
+        np.testing.assert_array_equal(assignments, expected)
+
+    def test_filter_gives_same_assignments_as_lloyd_over_deep_tree(self):
+        data_objects = np.random.RandomState(0).randn(2000, 3)
+        np.random.seed(1)
+        expected = kmeans.kmeans(data_objects, 20, 50)
+        np.random.seed(1)
+        with unittest.mock.patch.object(kmeans._FilterAssigner, '_leaf_size', 16):
+            assignments = kmeans.kmeans(data_objects, 20, 50, algorithm='filter')
+
+        np.testing.assert_array_equal(assignments, expected)
+
+    def test_assigns_in_blocks_with_bounded_memory(self):
+        data_objects = np.random.RandomState(0).randn(500, 2)
+        for algorithm in ['lloyd', 'hamerly']:
+            np.random.seed(1)
+            expected = kmeans.kmeans(data_objects, 20, 50, algorithm=algorithm)
+            # Room for the distances of 7 data objects at a time
+            with unittest.mock.patch.object(kmeans, '_ASSIGN_WORKING_MEMORY', 7 * 20 * 8):
+                np.random.seed(1)
+                assignments = kmeans.kmeans(data_objects, 20, 50, algorithm=algorithm)
+
+            np.testing.assert_array_equal(assignments, expected)
+
+    def test_returns_lowest_inertia_restart(self):
+        data_objects = np.random.RandomState(0).randn(300, 2)
+        seeds = np.random.RandomState(0).randint(np.iinfo(np.int32).max, size=5)
+        restarts = [kmeans.kmeans(data_objects, 8, 20, random_state=seed) for seed in seeds]
+        inertias = [inertia(data_objects, assignments) for assignments in restarts]
+
+        assignments = kmeans.kmeans(data_objects, 8, 20, n_init=5, random_state=0)
+
+        np.testing.assert_array_equal(assignments, restarts[int(np.argmin(inertias))])
+
+    def test_parallel_restarts_match_serial_restarts(self):
+        data_objects = np.random.RandomState(0).randn(300, 2)
+        serial = kmeans.kmeans(data_objects, 8, 20, n_init=4, n_jobs=1, random_state=7)
+        parallel = kmeans.kmeans(data_objects, 8, 20, n_init=4, n_jobs=2, random_state=7)
+
+        np.testing.assert_array_equal(parallel, serial)
+
+    def test_reports_stats_of_each_iteration(self):
+        data_objects = np.random.RandomState(0).randn(300, 2)
+        stats = []
+        assignments = kmeans.kmeans(data_objects, 5, 50, n_init=2, random_state=7, callback=stats.append)
+
+        np.testing.assert_array_equal(assignments, kmeans.kmeans(data_objects, 5, 50, n_init=2, random_state=7))
+        self.assertEqual(sorted(set(iteration['restart'] for iteration in stats)), [0, 1])
+        first_restart = [iteration for iteration in stats if iteration['restart'] == 0]
+        self.assertEqual([iteration['iteration'] for iteration in first_restart], list(range(len(first_restart))))
+        self.assertEqual(first_restart[0]['reassigned'], 300)
+        self.assertEqual(first_restart[-1]['reassigned'], 0)
+        self.assertGreater(first_restart[1]['centroid_shift'], 0)
+        self.assertTrue(all(iteration['peak_memory'] is None for iteration in stats))
+        self.assertFalse(tracemalloc.is_tracing())
+
+    def test_reports_peak_memory_of_each_iteration_when_traced(self):
+        data_objects = np.random.RandomState(0).randn(300, 2)
+        stats = []
+        kmeans.kmeans(data_objects, 5, 50, random_state=7, callback=stats.append, trace_memory=True)
+
+        # The distances of 300 data objects to 5 centroids are allocated on every iteration
+        self.assertGreaterEqual(stats[1]['peak_memory'], 300 * 5 * 8)
+        self.assertFalse(tracemalloc.is_tracing())
+
+    def test_parallel_restarts_report_same_stats_as_serial(self):
+        data_objects = np.random.RandomState(0).randn(300, 2)
+        serial = []
+        parallel = []
+        kmeans.kmeans(data_objects, 8, 20, n_init=3, n_jobs=1, random_state=7, callback=serial.append)
+        kmeans.kmeans(data_objects, 8, 20, n_init=3, n_jobs=2, random_state=7, callback=parallel.append)
+
+        self.assertEqual(
+            [(iteration['restart'], iteration['iteration'], iteration['reassigned']) for iteration in parallel],
+            [(iteration['restart'], iteration['iteration'], iteration['reassigned']) for iteration in serial]
+        )
+
+    def test_streams_over_npy_file_in_row_blocks(self):
+        data_objects = np.random.RandomState(0).randn(500, 3)
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'data_objects.npy')
+            out_path = os.path.join(directory, 'assignments.npy')
+            np.save(path, data_objects)
+            expected = kmeans.kmeans(data_objects, 4, 50, random_state=2)
+            assignments = kmeans.kmeans(path, 4, 50, random_state=2, block_size=64, out=out_path)
+
+            np.testing.assert_array_equal(assignments, expected)
+            np.testing.assert_array_equal(np.load(out_path), expected)
+            del assignments
+
+    def test_sharded_gives_same_assignments_as_unsharded(self):
+        data_objects = np.random.RandomState(0).randn(500, 3)
+        expected = kmeans.kmeans(data_objects, 4, 50, random_state=2)
+        assignments = kmeans.kmeans(data_objects, 4, 50, random_state=2, n_shards=3)
+
+        np.testing.assert_array_equal(assignments, expected)
+
+    def test_raises_exception_when_sharding_with_parallel_restarts(self):
+        with self.assertRaisesRegex(ValueError, 'n_jobs must be 1 when n_shards'):
+            kmeans.kmeans(blobs, 3, 10, n_init=2, n_jobs=2, n_shards=2)
+
+    def test_raises_exception_when_streaming_with_accelerated_algorithm(self):
+        with self.assertRaisesRegex(ValueError, 'Only the lloyd algorithm can stream'):
+            kmeans.kmeans(blobs, 3, 10, algorithm='elkan', block_size=4)
+
+    def test_raises_exception_when_algorithm_unknown(self):
+        with self.assertRaisesRegex(ValueError, 'algorithm must be one of'):
+            kmeans.kmeans(blobs, 3, 10, algorithm='magic')
+
+
+class CalculateCentroids(unittest.TestCase):
+    def test_returns_mean_of_each_cluster(self):
+        centroids = kmeans.calculate_centroids(blobs[:8], np.array([0] * 4 + [1] * 4))
+
+        np.testing.assert_allclose(centroids, [[0.05, 0.1], [5.05, 5.05]])
+
+    def test_drops_empty_clusters_without_previous_centroids(self):
+        centroids = kmeans.calculate_centroids(blobs[:8], np.array([0] * 4 + [2] * 4))
+
+        np.testing.assert_allclose(centroids, [[0.05, 0.1], [5.05, 5.05]])
+
+    def test_empty_clusters_keep_previous_centroids(self):
+        previous_centroids = np.array([[1.0, 1.0], [7.0, 7.0], [3.0, 3.0]])
+        centroids = kmeans.calculate_centroids(blobs[:8], np.array([0] * 4 + [2] * 4), previous_centroids)
+
+        np.testing.assert_allclose(centroids, [[0.05, 0.1], [7.0, 7.0], [5.05, 5.05]])
+
+
+class KMeans(unittest.TestCase):
+    def test_keeps_centroids_and_inertia(self):
+        model = kmeans.KMeans(3, random_state=3).fit(blobs)
+
+        self.assertEqual(model.centroids.shape, (3, 2))
+        self.assertAlmostEqual(model.inertia, inertia(blobs, model.assignments))
+        assert_same_partition(self, model.assignments, [0] * 4 + [1] * 4 + [2] * 4)
+
+    def test_predicts_nearest_centroid_for_new_data_objects(self):
+        model = kmeans.KMeans(3, random_state=3).fit(blobs)
+
+        np.testing.assert_array_equal(
+            model.predict([[0.3, 0.3], [4.8, 4.8], [9.5, 0.5]]),
+            model.assignments[[0, 4, 8]]
+        )
+
+    def test_transforms_to_distances_from_centroids(self):
+        model = kmeans.KMeans(3, random_state=3).fit(blobs)
+        distances = model.transform(blobs)
+
+        self.assertEqual(distances.shape, (12, 3))
+        np.testing.assert_array_equal(np.argmin(distances, axis=1), model.assignments)
+
+    def test_warm_start_continues_from_fitted_centroids(self):
+        model = kmeans.KMeans(3, random_state=3, warm_start=True).fit(blobs)
+        centroids = model.centroids.copy()
+        model.fit(blobs + 0.01)
+
+        np.testing.assert_allclose(model.centroids, centroids + 0.01)
+
+    def test_raises_exception_when_predicting_before_fit(self):
+        with self.assertRaisesRegex(ValueError, 'must be fitted'):
+            kmeans.KMeans(3).predict(blobs)
+
+
+class MiniBatchKMeans(unittest.TestCase):
+    def test_partial_fit_moves_centroids_to_running_mean(self):
+        model = kmeans.MiniBatchKMeans(1, random_state=0)
+        model.partial_fit(np.array([[0.0, 0.0]]))
+        model.partial_fit(np.array([[2.0, 2.0], [4.0, 4.0]]))
+
+        np.testing.assert_allclose(model.centroids, [[2.0, 2.0]])
+        np.testing.assert_array_equal(model.counts, [3])
+
+    def test_partial_fit_over_chunks_finds_the_clusters(self):
+        model = kmeans.MiniBatchKMeans(3, random_state=0)
+        model.partial_fit(blobs[[0, 4, 8]])
+        for chunk in np.array_split(blobs, 4):
+            model.partial_fit(chunk)
+
+        assert_same_partition(self, model.predict(blobs), [0] * 4 + [1] * 4 + [2] * 4)
+
+    def test_returns_assignments_from_fit(self):
+        assignments = kmeans.minibatch_kmeans(blobs, 3, 50, batch_size=6, random_state=0)
+
+        self.assertEqual(assignments.shape, (12, ))
+        self.assertEqual(len(np.unique(assignments)), 3)
+
+    def test_fit_seeds_distinct_data_objects(self):
+        data_objects = np.arange(10, dtype=float)[:, np.newaxis]
+        model = kmeans.MiniBatchKMeans(10, iterations=0, random_state=0).fit(data_objects)
+
+        np.testing.assert_array_equal(np.sort(model.centroids.ravel()), np.arange(10))
+
+    def test_raises_exception_when_fitting_fewer_than_k_data_objects(self):
+        with self.assertRaisesRegex(ValueError, 'data_objects must contain at least k data objects'):
+            kmeans.MiniBatchKMeans(3).fit(blobs[:2])
+
+    def test_raises_exception_when_first_batch_smaller_than_k(self):
+        with self.assertRaisesRegex(ValueError, 'at least k data objects'):
+            kmeans.MiniBatchKMeans(3).partial_fit(blobs[:2])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,3 +1,4 @@
+import tracemalloc
 import unittest
 import afdata.pattern_mining as pattern_mining
 
@@ -106,6 +107,60 @@ class PatternMining(unittest.TestCase):
 
         self.assertEqual(supports[frozenset(['bread', 'tea'])], 0)
 
+    def test_returns_weighted_support(self):
+        supports = pattern_mining.support(
+            [['milk', 'bread'], ['bread'], ['butter']],
+            [frozenset(['bread'])],
+            weights=[2, 3, 5]
+        )
+
+        self.assertEqual(supports[frozenset(['bread'])], 5 / 10)
+
+    def test_raises_exception_when_weights_and_transactions_differ_in_length(self):
+        with self.assertRaisesRegex(ValueError, 'weights must have one weight for each transaction'):
+            pattern_mining.support(transactions, [frozenset(['bread'])], weights=[1, 2])
+
+    def test_collapses_duplicate_transactions(self):
+        compressed, weights = pattern_mining.compress_transactions(transactions + [['jam', 'bread', 'butter']])
+
+        self.assertEqual(len(compressed), 6)
+        self.assertEqual(weights[compressed.index(('bread', 'butter', 'jam'))], 3)
+        self.assertEqual(sum(weights), 8)
+
+    def test_strips_infrequent_items_when_compressing(self):
+        compressed, weights = pattern_mining.compress_transactions(transactions, min_support=0.5)
+
+        self.assertEqual(dict(zip(compressed, weights)), {
+            ('bread', ): 2,
+            ('butter', ): 1,
+            (): 1,
+            ('bread', 'butter'): 3,
+        })
+
+    def test_compressed_transactions_give_same_frequent_itemsets(self):
+        compressed, weights = pattern_mining.compress_transactions(transactions, min_support=0.2)
+        frequent_itemsets, supports = pattern_mining.get_frequent_itemsets(compressed, weights=weights)
+
+        expected_itemsets, expected_supports = pattern_mining.get_frequent_itemsets(transactions)
+        self.assertEqual(dict(zip(frequent_itemsets, supports)), dict(zip(expected_itemsets, expected_supports)))
+
+    def test_compressed_sequence_transactions_give_same_supports(self):
+        sequences = [
+            (frozenset(['the']), frozenset(['service'])),
+            (frozenset(['the']), frozenset(['pizza'])),
+            (frozenset(['pizza']), ),
+        ]
+        compressed, weights = pattern_mining.compress_sequence_transactions(
+            sequence_transactions + sequence_transactions[:3],
+            min_support=0.2
+        )
+
+        self.assertEqual(sum(weights), 13)
+        self.assertEqual(
+            pattern_mining.sequence_support(compressed, sequences, weights),
+            pattern_mining.sequence_support(sequence_transactions + sequence_transactions[:3], sequences)
+        )
+
     def test_returns_true_when_candidate_is_subsequence(self):
         sequence = [frozenset(itemset) for itemset in sequence_transactions[0]]
 
@@ -275,6 +330,16 @@ class PatternMining(unittest.TestCase):
 
         self.assertEqual(confidence, 0)
 
+    def test_returns_weighted_confidence(self):
+        confidence = pattern_mining.confidence(
+            [['milk', 'bread'], ['milk'], ['bread']],
+            frozenset(['milk']),
+            frozenset(['bread']),
+            weights=[1, 3, 4]
+        )
+
+        self.assertEqual(confidence, 1 / 4)
+
     def test_returns_frequent_length_k_itemsets_and_supports(self):
         frequent_itemsets, supports = \
             pattern_mining.get_frequent_length_k_itemsets(transactions)
@@ -397,6 +462,29 @@ class PatternMining(unittest.TestCase):
             (frozenset(['bread']), 5 / 7),
         ])
 
+    def test_reports_stats_of_each_level(self):
+        stats = []
+        pattern_mining.get_frequent_itemsets(transactions, callback=stats.append)
+
+        self.assertEqual([level['k'] for level in stats], [1, 2, 3, 4])
+        self.assertEqual([level['candidates_generated'] for level in stats], [6, 6, 4, 0])
+        self.assertEqual([level['candidates_counted'] for level in stats], [6, 6, 4, 0])
+        self.assertEqual([level['frequent'] for level in stats], [4, 4, 1, 0])
+        for level in stats:
+            self.assertEqual(level['transactions_scanned'], 7)
+            self.assertEqual(level['candidates_pruned'], level['candidates_generated'] - level['candidates_counted'])
+            self.assertGreaterEqual(level['count_time'], 0)
+            self.assertIsNone(level['peak_memory'])
+        self.assertFalse(tracemalloc.is_tracing())
+
+    def test_reports_peak_memory_of_each_level_when_traced(self):
+        stats = []
+        pattern_mining.get_frequent_itemsets(transactions, callback=stats.append, trace_memory=True)
+
+        for level in stats:
+            self.assertGreaterEqual(level['peak_memory'], 0)
+        self.assertFalse(tracemalloc.is_tracing())
+
     def test_returns_length_sequence_which_has_no_elements(self):
         self.assertEqual(pattern_mining.sequence_len(()), 0)
 
@@ -0,0 +1,42 @@
+import unittest
+import numpy as np
+import afdata.stability as stability
+
+random_state = np.random.RandomState(0)
+separated = np.vstack([random_state.randn(100, 2) * 0.3 + centre for centre in ([0, 0], [5, 5], [10, 0])])
+uniform = random_state.rand(300, 2)
+
+
+class Stability(unittest.TestCase):
+    def test_well_separated_clusters_are_stable(self):
+        report = stability.stability(separated, 3, n_boot=8, n_init=5, random_state=2)
+
+        self.assertEqual(report.assignments.shape, (300, ))
+        self.assertEqual(report.cluster_interval.shape, (3, 2))
+        self.assertTrue(np.all(report.cluster_interval[:, 0] <= report.cluster_stability))
+        self.assertTrue(np.all(report.cluster_stability <= report.cluster_interval[:, 1]))
+        self.assertGreater(report.overall['jaccard'], 0.6)
+        self.assertGreater(report.overall['normalised_mutual_info'], 0.7)
+
+    def test_uniform_data_is_less_stable_than_separated_clusters(self):
+        separated_report = stability.stability(separated, 3, n_boot=8, n_init=5, random_state=2)
+        uniform_report = stability.stability(uniform, 6, n_boot=8, n_init=5, random_state=2)
+
+        self.assertLess(uniform_report.overall['jaccard'], separated_report.overall['jaccard'])
+        self.assertLess(np.mean(uniform_report.cluster_stability), np.mean(separated_report.cluster_stability))
+
+    def test_parallel_gives_same_report_as_serial(self):
+        serial = stability.stability(uniform, 4, n_boot=4, n_jobs=1, random_state=5)
+        parallel = stability.stability(uniform, 4, n_boot=4, n_jobs=2, random_state=5)
+
+        np.testing.assert_array_equal(parallel.assignments, serial.assignments)
+        np.testing.assert_array_equal(parallel.cluster_stability, serial.cluster_stability)
+        self.assertEqual(parallel.overall, serial.overall)
+
+    def test_raises_exception_for_too_few_resamples(self):
+        with self.assertRaisesRegex(ValueError, 'n_boot must be at least 2'):
+            stability.stability(separated, 3, n_boot=1)
+
+
+if __name__ == '__main__':
+    unittest.main()